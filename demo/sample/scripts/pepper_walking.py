@@ -3,7 +3,8 @@ import time
 import os
 import random
 import subprocess
-from src.main import allah
+from src.main import MAP_PATH, allah
+from graph.map_bundle import destinations, load_compiled  # Put on the path by src.main
 # from src import main
 
 
@@ -183,6 +184,7 @@ if __name__ == "__main__":
         pwu_obj.createCustomGreeting("",disability) #Save active username
     else:
         pwu_obj.createCustomGreeting(active_user,disability) #Save active username
+    pwu_obj.createDestinationActions(destinations(load_compiled(MAP_PATH))) # Destinations shown to the user
 
     if disability == "blind": # If blind
         mws.run_interaction(greeting)
@@ -193,6 +195,7 @@ if __name__ == "__main__":
         if(status != "failure"):
             print("[BLIND] launching assistant.py")
             #subprocess.call(['python', '/home/robot/playground/pepper_walking_assistant/assistant/assistant.py'])
+            args.target_room = status # The room chosen in blind_agree
             allah(args, mws)
 
         else:
@@ -210,6 +213,7 @@ if __name__ == "__main__":
             print("[DEAF] launching assistant.py")
             dest = pwu_obj.checkStatus()
             # subprocess.call(['python', '/home/robot/playground/pepper_walking_assistant/demo/sample/scripts/src/main.py', '--target_room', dest ])
+            args.target_room = dest # The room chosen in deaf_agree
             allah(args, mws)
 
         else:
@@ -1,3 +1,4 @@
+# -*- coding: utf-8 -*-
 import os
 class PepperWalkingUtils():
     def __init__(self):
@@ -39,6 +40,48 @@ GESTURE
                 
             file.write(contenuto)
 
+    def createDestinationActions(self, destinations):
+        # destinations: [(room, {language: alias})], the rooms of the map bundle with aliases.
+        # Both actions answer with the room name, the aliases are only shown and recognized.
+        def alias(room, aliases, language):
+            return aliases.get(language, aliases.get('en', room))
+
+        with open(os.path.join(self.actionsPath(), "blind_agree"), "w") as file:
+            contenuto = """IMAGE
+<*, *, *, *>:  img/happy.png
+----
+TTS
+<*,*,it,*>: Qual è la tua destinazione?
+<*,*,*,*>:  Which is your destination?
+----
+ASR 
+<*,*,it,*>:  {{{0}}}
+<*,*,*,*>:  {{{1}}}
+----
+""".format(", ".join("'{0}': ['{1}']".format(room, alias(room, aliases, 'it')) for room, aliases in destinations),
+           ", ".join("'{0}': ['{1}']".format(room, alias(room, aliases, 'en')) for room, aliases in destinations))
+            file.write(contenuto)
+
+        with open(os.path.join(self.actionsPath(), "deaf_agree"), "w") as file:
+            contenuto = """IMAGE
+<*, *, *, *>:  img/happy.png
+----
+GESTURE
+<*,*,*,*>: animations/Stand/Gestures/Yes_1
+----
+TEXT
+<*,*,it,*>: Scegli la tua destinazione!
+<*,*,*,*>:  Choose your destination!
+----
+BUTTONS
+"""
+            for room, aliases in destinations:
+                contenuto += """{0}
+<*,*,it,*>: {1}
+<*,*,*,*>:  {2}
+""".format(room, alias(room, aliases, 'it'), alias(room, aliases, 'en'))
+            file.write(contenuto + "----\n")
+
     def checkStatus(self):
         status = None
         with open("/home/robot/playground/outcome.txt", "r") as file:
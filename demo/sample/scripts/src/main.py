@@ -6,12 +6,19 @@ import random
 import math
 import json
 import os
+import socket
+
+# The graph package and the map bundle are the ones of the repository (src/graph and
+# src/config/map.json), shared with the demo instead of copied into it
+REPOSITORY_SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', '..', 'src')
+MAP_PATH = os.path.join(REPOSITORY_SRC, 'config', 'map.json')
+sys.path.append(REPOSITORY_SRC)
 
 from automaton.automaton import State, TimeoutState, FiniteStateAutomaton
 from utils.limits import joint_limits
 from utils.postures import default_posture, left_arm_raised, right_arm_raised
-from graph.graph import Node, Graph
-from graph.room_mapper import RoomMapper
+from graph.routing_client import DEFAULT_SOCKET_PATH, RoutingClient
+from graph.routing_service import load_map
 
 # --------------------------------- Services --------------------------------- #
 
@@ -44,7 +51,12 @@ global automaton
 # Signals
 global touch_subscriber  #, word_subscriber
 
+# Routing daemon client, open for the whole guidance session (None without a daemon)
+global routing_client
+routing_client = None
+
 # Current and target position
+global route
 global coords
 global current_pos
 global current_target
@@ -108,6 +120,7 @@ class MovingState(State):
         global at_goal
         global node_index
         while not at_goal:
+            started = time.time()
             print('[INFO] At goal status: {}'.format(at_goal))
             print('[INFO] Node index: {}'.format(node_index))
             print('[INFO] Current target: {}'.format(coords[node_index]))
@@ -118,6 +131,8 @@ class MovingState(State):
             success = move_to(current_target_x, current_target_y, theta)
             print('[INFO] Success state for {}: {}'.format(node_index, success))
             if success:
+                if node_index > 0:
+                    record_leg_duration(route[node_index - 1:node_index + 1], time.time() - started)
                 node_index += 1
             if node_index == len(coords):
                 print('[INFO] Success in exit if')
@@ -152,6 +167,12 @@ class QuitState(State):
         # word_subscriber.signal.disconnect()
         # touch_subscriber.signal.disconnect()
 
+        # The guidance session is over
+        global routing_client
+        if routing_client is not None:
+            routing_client.close()
+            routing_client = None
+
         print("[INFO] Done")
 
 
@@ -316,6 +337,18 @@ def stop_motion():
     except Exception as e:
         print("[ERROR] Failed to stop motion: {}".format(e))
 
+def record_leg_duration(nodes, duration):
+    """
+    Send the time taken by a motion leg to the routing daemon, which learns the edge
+    weights from it.
+    """
+    print('[INFO] Leg ' + ' -> '.join(str(node) for node in nodes) + ' took ' + str(round(duration, 2)) + ' s')
+    if routing_client is not None:
+        try:
+            routing_client.record_leg(nodes, duration)
+        except (socket.error, ValueError) as e:
+            print('[WARN] Unable to send the leg duration to the routing daemon: ' + str(e))
+
 def load_language(languages_path, language_code):
     """
     Load the translation file based on the selected language.
@@ -420,16 +453,36 @@ def allah(args, mws):
     mws.run_interaction(greetings)
 
     # --------------------------- Graph initialization --------------------------- #
-    graph = Graph.static_load('src/config/graph.txt')
-    distance, path = graph.shortest_path(args.current_room, args.target_room, args.alevel)
+    # The routing daemon keeps the map loaded between sessions; without it, plan here.
+    # The client stays open until the quit state, to report the leg durations.
+    # The demo does not reroute, so it never closes corridors on the daemon.
+    global routing_client
+    routing_client = RoutingClient(getattr(args, 'socket', DEFAULT_SOCKET_PATH))
+    if routing_client.available():
+        print("[INFO] Planning with the routing daemon")
+        room_mapper = routing_client.room_mapper()
+        distance, path = routing_client.shortest_path(args.current_room, args.target_room, args.alevel)
+        minimum_level = routing_client.minimum_level(args.current_room, args.target_room) if not path else None
+    else:
+        print("[WARN] Routing daemon not running, planning in process")
+        routing_client = None
+        graph, room_mapper, _ = load_map(MAP_PATH)
+        distance, path = graph.shortest_path(args.current_room, args.target_room, args.alevel)
+        minimum_level = None
     print("[INFO] Current room       : " + str(args.current_room))
     print("[INFO] Target room        : " + str(args.target_room))
     print("[INFO] Accessibility level: " + str(args.alevel))
     print("[INFO] Path               : " + str(path))
+    if not path:
+        print("[ERROR] No route from " + str(args.current_room) + " to " + str(args.target_room) +
+              " at accessibility level " + str(args.alevel))
+        if minimum_level is not None:
+            print("[ERROR] The target room can be reached from accessibility level " + str(minimum_level))
+        sys.exit(1)
 
     # Take the coordinates for each node
-    global coords
-    room_mapper = RoomMapper.static_load('src/config/coords.txt')
+    global route, coords
+    route = path
     print("[INFO] Rooms coordinates  : ")
     for name, (x, y) in room_mapper.rooms.items():
         print("[INFO] \t" + name + ": ( " + str(x) + ", " + str(y) + ")")
@@ -499,6 +552,8 @@ if __name__ == "__main__":
                         help='Number of seconds to wait with the hand raised before canceling the procedure')
     parser.add_argument("--lang", type=str, default='en',
                         help='Language')
+    parser.add_argument("--socket", type=str, default=DEFAULT_SOCKET_PATH,
+                        help='Unix socket of the routing daemon. Without a daemon the route is planned in process')
 
     args = parser.parse_args()
 
@@ -0,0 +1,188 @@
+import argparse
+import heapq
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from graph.graph import Graph
+from graph.landmarks import Landmarks, expansion_report
+from graph.room_mapper import RoomMapper
+from graph import synthetic
+
+try:
+    import tracemalloc
+except ImportError:  # Python 2
+    tracemalloc = None
+    import resource
+
+# Routing benchmark on synthetic buildings: load time, query latency percentiles,
+# node expansions and peak memory, with every route checked against a reference Dijkstra.
+#
+# Example:
+#   python2 dev/benchmark.py --kinds grid,tree,floors --sizes 10,1000,100000 --output results.json
+
+
+def reference_dijkstra(graph, start, end, accessibility_level):
+    """
+    Plain Dijkstra on the raw adjacency list, used as the correctness oracle.
+    """
+    distances = {start: 0}
+    priority_queue = [(0, start)]
+    while priority_queue:
+        current_distance, current_node = heapq.heappop(priority_queue)
+        if current_node == end:
+            return current_distance
+        if current_distance > distances[current_node]:
+            continue
+        for neighbor, weight, accessibility_weight in graph.adjacency_list[current_node]:
+            if accessibility_weight <= accessibility_level:
+                tentative_distance = current_distance + weight
+                if tentative_distance < distances.get(neighbor, float('inf')):
+                    distances[neighbor] = tentative_distance
+                    heapq.heappush(priority_queue, (tentative_distance, neighbor))
+    return float('inf')
+
+
+def path_weight(graph, path, accessibility_level):
+    return sum(min(weight for neighbor, weight, accessibility_weight in graph.adjacency_list[node1]
+                   if neighbor == node2 and accessibility_weight <= accessibility_level)
+               for node1, node2 in zip(path, path[1:]))
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def start_memory_tracking():
+    if tracemalloc is not None:
+        tracemalloc.start()
+
+
+def stop_memory_tracking():
+    # Peak memory in bytes: traced allocations on Python 3, max resident set size on Python 2
+    if tracemalloc is not None:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return peak
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def run(kind, size, queries, seed, check, landmarks=False):
+    graph, room_mapper = synthetic.generate(kind, size, seed)
+    directory = tempfile.mkdtemp()
+    try:
+        graph_path = os.path.join(directory, 'graph.txt')
+        coords_path = os.path.join(directory, 'coords.txt')
+        graph.save(graph_path)
+        room_mapper.save(coords_path)
+
+        start_memory_tracking()
+        started = time.time()
+        loaded_rooms = RoomMapper.static_load(coords_path)
+        rooms_load_time = time.time() - started
+        started = time.time()
+        loaded_graph = Graph.static_load(graph_path, coordinates=loaded_rooms)
+        graph_load_time = time.time() - started
+        load_memory = stop_memory_tracking()
+    finally:
+        shutil.rmtree(directory)
+
+    rng = random.Random(seed)
+    nodes = loaded_graph.get_nodes()
+    query_list = [(rng.choice(nodes), rng.choice(nodes), rng.randint(0, 2)) for _ in range(queries)]
+    latencies, expansions, errors = [], [], 0
+    start_memory_tracking()
+    for start, end, accessibility_level in query_list:
+        started = time.time()
+        distance, path = loaded_graph.shortest_path(start, end, accessibility_level)
+        latencies.append(time.time() - started)
+        expansions.append(loaded_graph.expanded_nodes)
+
+        if check:
+            expected = reference_dijkstra(loaded_graph, start, end, accessibility_level)
+            valid_path = (not path and distance == float('inf')) or (
+                path[0] == start and path[-1] == end and
+                abs(path_weight(loaded_graph, path, accessibility_level) - distance) < 1e-9)
+            same_distance = distance == expected or abs(distance - expected) < 1e-9
+            if not same_distance or not valid_path:
+                errors += 1
+    query_memory = stop_memory_tracking()
+
+    # A* node expansions with the zero, straight-line and landmark heuristics
+    heuristics = None
+    if landmarks:
+        started = time.time()
+        built_landmarks = Landmarks.build(loaded_graph)
+        build_time = time.time() - started
+        heuristics = expansion_report(loaded_graph, query_list, built_landmarks)
+        heuristics['landmarks_build_seconds'] = build_time
+
+    return {
+        'kind': kind,
+        'nodes': len(nodes),
+        'edges': sum(len(neighbors) for neighbors in loaded_graph.adjacency_list.values()),
+        'graph_load_seconds': graph_load_time,
+        'rooms_load_seconds': rooms_load_time,
+        'queries': queries,
+        'latency_seconds': {
+            'p50': percentile(latencies, 0.5),
+            'p90': percentile(latencies, 0.9),
+            'p99': percentile(latencies, 0.99),
+            'max': max(latencies) if latencies else None,
+        },
+        'expanded_nodes_mean': float(sum(expansions)) / len(expansions) if expansions else None,
+        'expanded_nodes_by_heuristic': heuristics,
+        'peak_memory_bytes': {'load': load_memory, 'queries': query_memory},
+        'oracle_errors': errors if check else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--kinds", type=str, default='grid,tree,floors',
+                        help='Comma separated building kinds: grid, tree, floors')
+    parser.add_argument("--sizes", type=str, default='10,100,1000,10000',
+                        help='Comma separated numbers of rooms, up to 1000000')
+    parser.add_argument("--queries", type=int, default=100,
+                        help='Number of random queries per building')
+    parser.add_argument("--seed", type=int, default=0,
+                        help='Random seed')
+    parser.add_argument("--landmarks", action='store_true',
+                        help='Also report the A* node expansions with the landmark heuristic')
+    parser.add_argument("--no_check", action='store_true',
+                        help='Skip the comparison against the reference Dijkstra')
+    parser.add_argument("--output", type=str, default=None,
+                        help='JSON file to write the results to. Defaults to the standard output')
+    args = parser.parse_args()
+
+    results = []
+    for kind in args.kinds.split(','):
+        for size in [int(size) for size in args.sizes.split(',')]:
+            result = run(kind, size, args.queries, args.seed, not args.no_check, args.landmarks)
+            results.append(result)
+            sys.stderr.write("[INFO] " + kind + " " + str(result['nodes']) + " nodes: p50 " +
+                             str(round(result['latency_seconds']['p50'] * 1000, 3)) + " ms, " +
+                             str(result['oracle_errors']) + " oracle errors\n")
+
+    if args.output is None:
+        json.dump(results, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    else:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+
+    if any(result['oracle_errors'] for result in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+import argparse
+import sys
+
+from graph import binary_map
+from graph import map_bundle
+
+# Convert the map between the text files (graph.txt, coords.txt), the map bundle and the
+# binary map format:
+#   to_binary / to_text  text files <-> binary map
+#   to_bundle            text files  -> map bundle
+#   compile              map bundle  -> binary map, after validating the bundle
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("direction", choices=['to_binary', 'to_text', 'to_bundle', 'compile'],
+                        help='Conversion direction')
+    parser.add_argument("--graph", type=str, default='graph.txt',
+                        help='Graph file in the text format')
+    parser.add_argument("--coords", type=str, default='coords.txt',
+                        help='Coordinates file in the text format')
+    parser.add_argument("--map", type=str, default='src/config/map.pwmap',
+                        help='Binary map file')
+    parser.add_argument("--bundle", type=str, default='src/config/map.json',
+                        help='Map bundle file')
+    args = parser.parse_args()
+
+    if args.direction == 'compile':
+        try:
+            warnings = map_bundle.compile_file(args.bundle, args.map)
+        except ValueError as e:
+            print("[ERROR] " + str(e))
+            sys.exit(1)
+        for warning in warnings:
+            print("[WARN] " + warning)
+        print("[INFO] Wrote " + args.map)
+    elif args.direction == 'to_bundle':
+        map_bundle.text_to_bundle(args.graph, args.coords, args.bundle)
+        print("[INFO] Wrote " + args.bundle)
+    elif args.direction == 'to_binary':
+        binary_map.text_to_binary(args.graph, args.coords, args.map)
+        print("[INFO] Wrote " + args.map)
+    else:
+        binary_map.binary_to_text(args.map, args.graph, args.coords)
+        print("[INFO] Wrote " + args.graph + " and " + args.coords)
+
+
+if __name__ == "__main__":
+    main()
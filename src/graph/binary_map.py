@@ -0,0 +1,192 @@
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from .compact_graph import CompactGraph
+
+# Binary map format, little endian, every section aligned to 8 bytes:
+#
+#   header        magic, version, flags, node count, edge count, names size, metadata size
+#   name offsets  uint64[nodes + 1], byte offsets of each name in the names blob
+#   names         utf-8 blob
+#   offsets       int64[nodes + 1], CSR offsets
+#   targets       int32[edges]
+#   weights       float64[edges]
+#   accessibility int32[edges]
+#   coordinates   float64[nodes x 2], NaN where a node has none (only if FLAG_COORDINATES)
+#   metadata      utf-8 JSON object (aliases, edge features, source checksum, ...), may be empty
+#
+# Version 1 files have no metadata size in the header and no metadata section.
+#
+# Edges are stored exactly as listed in graph.txt, one per line, so the text files can be
+# rebuilt without loss.
+
+MAGIC = b'PWMAP\0\0\0'
+VERSION = 2
+FLAG_COORDINATES = 1
+
+_PREFIX = struct.Struct('<8sI')
+_HEADERS = {1: struct.Struct('<8sIIQQQ'), 2: struct.Struct('<8sIIQQQQ')}
+
+
+def _padding(size):
+    return (8 - size % 8) % 8
+
+
+def _read_text(graph_path, coords_path=None):
+    names, ids, arcs = [], {}, []
+
+    def intern(name):
+        if name not in ids:
+            ids[name] = len(names)
+            names.append(name)
+        return ids[name]
+
+    with open(graph_path, 'r') as file:
+        for line in file:
+            if not line.strip():
+                continue
+            node1, node2, weight, accessibility_weight = line.split()
+            arcs.append((intern(node1), intern(node2), float(weight), int(accessibility_weight)))
+
+    rooms = []
+    if coords_path is not None:
+        with open(coords_path, 'r') as file:
+            for line in file:
+                if not line.strip():
+                    continue
+                name, x, y = line.split()
+                rooms.append((intern(name), float(x), float(y)))
+
+    # Group the edges by source, keeping the order of the file within each source
+    order = sorted(range(len(arcs)), key=lambda i: arcs[i][0])
+    offsets = np.zeros(len(names) + 1, dtype=np.int64)
+    for node1, _, _, _ in arcs:
+        offsets[node1 + 1] += 1
+    offsets = np.cumsum(offsets)
+
+    coordinates = None
+    if coords_path is not None:
+        coordinates = np.full((len(names), 2), np.nan)
+        for i, x, y in rooms:
+            coordinates[i] = (x, y)
+
+    return CompactGraph(names, offsets,
+                        np.array([arcs[i][1] for i in order], dtype=np.int32),
+                        np.array([arcs[i][2] for i in order], dtype=np.float64),
+                        np.array([arcs[i][3] for i in order], dtype=np.int32),
+                        coordinates)
+
+
+def save(graph, path):
+    """
+    Write a CompactGraph to path in the binary map format.
+    """
+    encoded = [name if isinstance(name, bytes) else name.encode('utf-8') for name in graph.names]
+    name_offsets = np.zeros(len(encoded) + 1, dtype=np.uint64)
+    name_offsets[1:] = np.cumsum([len(name) for name in encoded])
+    names_blob = b''.join(encoded)
+
+    flags = FLAG_COORDINATES if graph.coordinates is not None else 0
+    metadata = json.dumps(graph.metadata, sort_keys=True).encode('utf-8') if graph.metadata else b''
+    sections = [name_offsets.tobytes(), names_blob,
+                graph.offsets.astype('<i8').tobytes(),
+                graph.targets.astype('<i4').tobytes(),
+                graph.weights.astype('<f8').tobytes(),
+                graph.accessibility_weights.astype('<i4').tobytes()]
+    if flags & FLAG_COORDINATES:
+        sections.append(graph.coordinates.astype('<f8').tobytes())
+    sections.append(metadata)
+
+    # Written next to the target and renamed over it, so processes mapping or loading the
+    # old file keep reading it whole
+    temporary_path = path + '.tmp' + str(os.getpid())
+    try:
+        with open(temporary_path, 'wb') as file:
+            file.write(_HEADERS[VERSION].pack(MAGIC, VERSION, flags, len(graph.names), len(graph.targets),
+                                              len(names_blob), len(metadata)))
+            for section in sections:
+                file.write(section)
+                file.write(b'\0' * _padding(len(section)))
+        os.rename(temporary_path, path)
+    except BaseException:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        raise
+
+
+def load(path):
+    """
+    Map a binary map file in memory and return a CompactGraph whose arrays are views
+    on the mapping: nothing is copied, and processes loading the same file share
+    the page cache.
+    """
+    with open(path, 'rb') as file:
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic, version = _PREFIX.unpack_from(buffer, 0)
+    if magic != MAGIC:
+        raise ValueError("Not a binary map file: " + path)
+    if version not in _HEADERS:
+        raise ValueError("Unsupported binary map version " + str(version) + " in " + path)
+
+    header = _HEADERS[version].unpack_from(buffer, 0)
+    _, _, flags, node_count, edge_count, names_size = header[:6]
+    metadata_size = header[6] if version >= 2 else 0
+
+    position = [_HEADERS[version].size]
+
+    def section(dtype, count):
+        array = np.frombuffer(buffer, dtype=dtype, count=count, offset=position[0])
+        position[0] += array.nbytes + _padding(array.nbytes)
+        return array
+
+    name_offsets = section('<u8', node_count + 1)
+    names_blob = section('u1', names_size)
+    offsets = section('<i8', node_count + 1)
+    targets = section('<i4', edge_count)
+    weights = section('<f8', edge_count)
+    accessibility_weights = section('<i4', edge_count)
+    coordinates = section('<f8', 2 * node_count).reshape(node_count, 2) if flags & FLAG_COORDINATES else None
+    metadata = json.loads(section('u1', metadata_size).tobytes().decode('utf-8')) if metadata_size else None
+
+    blob = names_blob.tobytes()
+    name_offsets = name_offsets.tolist()
+    names = [blob[name_offsets[i]:name_offsets[i + 1]] for i in range(node_count)]
+    if str is not bytes:
+        names = [name.decode('utf-8') for name in names]
+
+    return CompactGraph(names, offsets, targets, weights, accessibility_weights, coordinates, metadata)
+
+
+def text_to_binary(graph_path, coords_path, output_path):
+    """
+    Convert graph.txt and coords.txt (optional, may be None) to a binary map file.
+    """
+    save(_read_text(graph_path, coords_path), output_path)
+
+
+def binary_to_text(binary_path, graph_path, coords_path=None):
+    """
+    Convert a binary map file back to graph.txt and coords.txt.
+    """
+    graph = load(binary_path)
+
+    def number(value):
+        return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+    with open(graph_path, 'w') as file:
+        offsets = graph.offsets.tolist()
+        for i, name in enumerate(graph.names):
+            for j in range(offsets[i], offsets[i + 1]):
+                file.write(name + " " + graph.names[graph.targets[j]] + " " + number(graph.weights[j]) +
+                           " " + str(graph.accessibility_weights[j]) + "\n")
+
+    if coords_path is not None and graph.coordinates is not None:
+        with open(coords_path, 'w') as file:
+            for name, (x, y) in zip(graph.names, graph.coordinates.tolist()):
+                if x == x and y == y:  # Skip NaN, nodes without coordinates
+                    file.write(name + " " + number(x) + " " + number(y) + "\n")
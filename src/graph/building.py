@@ -0,0 +1,188 @@
+import heapq
+import itertools
+import os
+
+from .graph import Graph
+
+# Accessibility weights of the portals between floors, as for the edges in graph.txt
+ELEVATOR_ACCESSIBILITY_WEIGHT = 0
+STAIRS_ACCESSIBILITY_WEIGHT = 1
+
+
+class Building:
+    """
+    Multi-floor map: one Graph per floor, connected by elevator and stairs portals.
+    Nodes are identified by (floor, room) pairs.
+
+    Path-finding is hierarchical: the route is planned first over the portal graph,
+    whose edges inside a floor are computed the first time a search reaches that
+    floor, and then refined inside each floor it crosses. A query only touches
+    the floors the search reaches, and the portal distances are cached between
+    queries.
+    """
+
+    def __init__(self):
+        self.floors = {}
+        self.portals = []  # (floor1, node1, floor2, node2, weight, accessibility_weight, kind)
+
+        # {(floor, node, accessibility_level): {node: distance}} inside a floor
+        self._floor_distances = {}
+
+        # Number of abstract nodes expanded by the last query
+        self.expanded_nodes = 0
+
+    def add_floor(self, name, graph):
+        self.floors[name] = graph
+        self.invalidate()
+
+    def add_portal(self, floor1, node1, floor2, node2, weight, accessibility_weight, kind):
+        self.portals.append((floor1, node1, floor2, node2, weight, accessibility_weight, kind))
+        self.invalidate()
+
+    def add_elevator(self, floor1, node1, floor2, node2, weight=1):
+        self.add_portal(floor1, node1, floor2, node2, weight, ELEVATOR_ACCESSIBILITY_WEIGHT, 'elevator')
+
+    def add_stairs(self, floor1, node1, floor2, node2, weight=1):
+        self.add_portal(floor1, node1, floor2, node2, weight, STAIRS_ACCESSIBILITY_WEIGHT, 'stairs')
+
+    def invalidate(self):
+        """
+        Drop the cached distances. Call it after editing the graph of a floor.
+        """
+        self._floor_distances = {}
+
+    def load(self, path):
+        """
+        Load a building file with one entry per line:
+            floor <name> <graph file>
+            portal <floor1> <node1> <floor2> <node2> <weight> <accessibility_weight> <kind>
+        Graph files are relative to the building file.
+        """
+        directory = os.path.dirname(path)
+        with open(path, 'r') as file:
+            for line in file:
+                parts = line.split()
+                if not parts or parts[0].startswith('#'):
+                    continue
+                if parts[0] == 'floor' and len(parts) == 3:
+                    self.add_floor(parts[1], Graph.static_load(os.path.join(directory, parts[2])))
+                elif parts[0] == 'portal' and len(parts) == 9:
+                    floor1, node1, floor2, node2, weight, accessibility_weight, kind = parts[1:]
+                    self.add_portal(floor1, node1, floor2, node2, int(weight), int(accessibility_weight), kind)
+                else:
+                    raise ValueError("Malformed line in " + path + ": " + line.strip())
+
+    @classmethod
+    def static_load(cls, path):
+        building = Building()
+        building.load(path)
+        return building
+
+    def save(self, path, floor_paths):
+        """
+        Save the building file, with floor_paths mapping each floor to its graph file.
+        """
+        with open(path, 'w') as file:
+            for name in self.floors:
+                file.write("floor " + str(name) + " " + floor_paths[name] + "\n")
+            for floor1, node1, floor2, node2, weight, accessibility_weight, kind in self.portals:
+                file.write("portal " + " ".join(str(value) for value in
+                                                (floor1, node1, floor2, node2, weight, accessibility_weight, kind)) + "\n")
+
+    # ----------------------------- Abstract graph ---------------------------- #
+
+    def _portal_edges(self, accessibility_level):
+        edges = {}
+        for floor1, node1, floor2, node2, weight, accessibility_weight, _ in self.portals:
+            if accessibility_weight <= accessibility_level:
+                edges.setdefault((floor1, node1), []).append(((floor2, node2), weight))
+                edges.setdefault((floor2, node2), []).append(((floor1, node1), weight))
+        return edges
+
+    def _distances_on_floor(self, floor, node, accessibility_level, portals, end=None):
+        # Distances to the portals are cached, the one to the end of the query is not
+        key = (floor, node, accessibility_level)
+        cached = self._floor_distances.get(key)
+        targets = list(portals) if cached is None else []
+        if end is not None:
+            targets.append(end)
+        if not targets:
+            return cached if cached is not None else {}
+
+        distances, _ = self.floors[floor]._dijkstra(node, accessibility_level, targets)
+        if cached is None:
+            cached = dict((portal, distances[portal]) for portal in portals if portal in distances)
+            self._floor_distances[key] = cached
+        if end is None or end not in distances:
+            return cached
+        result = dict(cached)
+        result[end] = distances[end]
+        return result
+
+    def abstract_path(self, start, end, accessibility_level):
+        """
+        Plan over the portal graph. Returns the distance and the sequence of (floor, node)
+        waypoints: the start, the portals crossed and the end.
+        """
+        portal_edges = self._portal_edges(accessibility_level)
+        portals_on_floor = {}
+        for floor, node in portal_edges:
+            portals_on_floor.setdefault(floor, []).append(node)
+
+        distances = {start: 0}
+        parents = {}
+        counter = itertools.count()
+        priority_queue = [(0, next(counter), start)]
+        self.expanded_nodes = 0
+
+        while priority_queue:
+            current_distance, _, current = heapq.heappop(priority_queue)
+            if current_distance > distances[current]:
+                continue
+            self.expanded_nodes += 1
+
+            if current == end:
+                path = [end]
+                while path[-1] != start:
+                    path.append(parents[path[-1]])
+                path.reverse()
+                return current_distance, path
+
+            floor, node = current
+            portals = [portal for portal in portals_on_floor.get(floor, []) if portal != node]
+            floor_distances = self._distances_on_floor(floor, node, accessibility_level, portals,
+                                                       end[1] if end[0] == floor else None)
+
+            # Edges inside the floor, then the portals leaving it
+            neighbors = [((floor, target), distance) for target, distance in floor_distances.items()]
+            neighbors.extend(portal_edges.get(current, []))
+
+            for neighbor, weight in neighbors:
+                tentative_distance = current_distance + weight
+                if tentative_distance < distances.get(neighbor, float('inf')):
+                    distances[neighbor] = tentative_distance
+                    parents[neighbor] = current
+                    heapq.heappush(priority_queue, (tentative_distance, next(counter), neighbor))
+
+        return float('inf'), []  # No path found
+
+    def refine(self, abstract_path, accessibility_level):
+        """
+        Expand an abstract path floor by floor, yielding the (floor, node) steps.
+        Each floor is searched only when the previous one has been consumed.
+        """
+        if not abstract_path:
+            return
+        yield abstract_path[0]
+        for (floor1, node1), (floor2, node2) in zip(abstract_path, abstract_path[1:]):
+            if floor1 != floor2:
+                # Portal between two floors
+                yield floor2, node2
+            else:
+                _, segment = self.floors[floor1].shortest_path(node1, node2, accessibility_level)
+                for node in segment[1:]:
+                    yield floor1, node
+
+    def shortest_path(self, start, end, accessibility_level):
+        distance, abstract_path = self.abstract_path(start, end, accessibility_level)
+        return distance, list(self.refine(abstract_path, accessibility_level))
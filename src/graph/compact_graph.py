@@ -0,0 +1,215 @@
+import heapq
+
+import numpy as np
+
+from .features import Capabilities, allowed_edges, edge_masks, feature_mask
+from .graph import Graph
+from .room_mapper import RoomMapper
+
+
+class CompactGraph:
+    """
+    Frozen, array-backed version of a Graph. Nodes are interned as integer ids
+    indexing the name table, and the edges are stored in CSR form: the edges
+    leaving node i are targets[offsets[i]:offsets[i + 1]], with the matching
+    weights and accessibility weights at the same positions.
+    """
+
+    def __init__(self, names, offsets, targets, weights, accessibility_weights, coordinates=None, metadata=None):
+        self.names = names
+        self.ids = dict((name, i) for i, name in enumerate(names))
+        self.offsets = offsets
+        self.targets = targets
+        self.weights = weights
+        self.accessibility_weights = accessibility_weights
+
+        # Optional n x 2 array of coordinates, NaN where a node has none
+        self.coordinates = coordinates
+        self._heuristic_scale = None
+
+        # Optional JSON-serializable map information stored with the binary map (see map_bundle.py)
+        self.metadata = metadata
+
+        # Barrier feature mask of every edge and the usable edges per accessibility level
+        # or Capabilities, built lazily: {level: boolean array}
+        self._feature_masks = None
+        self._allowed = {}
+
+        # Number of nodes expanded by the last search
+        self.expanded_nodes = 0
+
+    @classmethod
+    def from_graph(cls, graph, coordinates=None):
+        names = [str(node) for node in graph.adjacency_list]
+        ids = dict((name, i) for i, name in enumerate(names))
+
+        offsets = np.zeros(len(names) + 1, dtype=np.int64)
+        targets, weights, accessibility_weights = [], [], []
+        for i, neighbors in enumerate(graph.adjacency_list.values()):
+            offsets[i + 1] = offsets[i] + len(neighbors)
+            for neighbor, weight, accessibility_weight in neighbors:
+                targets.append(ids[str(neighbor)])
+                weights.append(weight)
+                accessibility_weights.append(accessibility_weight)
+
+        if coordinates is None:
+            coordinates = graph.coordinates
+        return cls(names, offsets,
+                   np.array(targets, dtype=np.int32),
+                   np.array(weights, dtype=np.float64),
+                   np.array(accessibility_weights, dtype=np.int32),
+                   cls._coordinates_array(names, coordinates))
+
+    @staticmethod
+    def _coordinates_array(names, coordinates):
+        if coordinates is None:
+            return None
+        array = np.full((len(names), 2), np.nan)
+        for i, name in enumerate(names):
+            try:
+                array[i] = coordinates[name]
+            except KeyError:
+                pass
+        return array
+
+    def to_graph(self, directed=False, coordinates=None):
+        """
+        Build a mutable Graph from the stored edges, as Graph.load does from the lines.
+        The Graph is a per-process copy: unlike the arrays, it is not shared.
+        """
+        graph = Graph(directed=directed, coordinates=coordinates)
+        for node1, node2, features in self._listed_features():
+            graph.edge_features[(node1, node2)] = feature_mask(features)
+            if not directed:
+                graph.edge_features[(node2, node1)] = feature_mask(features)
+        names = self.names
+        sources = np.repeat(np.arange(len(names)), np.diff(self.offsets)).tolist()
+        graph.add_edges((names[source], names[target], int(weight) if weight.is_integer() else weight,
+                         accessibility_weight)
+                        for source, target, weight, accessibility_weight in zip(sources, self.targets.tolist(),
+                                                                                self.weights.tolist(),
+                                                                                self.accessibility_weights.tolist()))
+        return graph
+
+    def to_room_mapper(self):
+        room_mapper = RoomMapper()
+        if self.coordinates is not None:
+            for name, (x, y) in zip(self.names, self.coordinates.tolist()):
+                if x == x and y == y:  # Skip NaN, nodes without coordinates
+                    room_mapper.add_room(name, x, y)
+        return room_mapper
+
+    def _listed_features(self):
+        # [from, to, [feature names]] of the corridors listed with features in the map bundle
+        return (self.metadata or {}).get('features', [])
+
+    def _get_feature_masks(self):
+        if self._feature_masks is None:
+            directed = bool((self.metadata or {}).get('directed', False))
+            listed = {}
+            for node1, node2, features in self._listed_features():
+                listed[(node1, node2)] = feature_mask(features)
+                if not directed:
+                    listed[(node2, node1)] = feature_mask(features)
+
+            explicit = {}
+            if listed:
+                sources = np.repeat(np.arange(len(self.names)), np.diff(self.offsets)).tolist()
+                for j, (source, target) in enumerate(zip(sources, self.targets.tolist())):
+                    mask = listed.get((self.names[source], self.names[target]))
+                    if mask is not None:
+                        explicit[j] = mask
+            self._feature_masks = edge_masks(self.accessibility_weights, explicit)
+        return self._feature_masks
+
+    def _get_allowed(self, accessibility_level):
+        """
+        Boolean array of the edges usable at an accessibility level or by a Capabilities,
+        computed in one vectorized pass and cached.
+        """
+        allowed = self._allowed.get(accessibility_level)
+        if allowed is None:
+            if isinstance(accessibility_level, Capabilities):
+                allowed = allowed_edges(self._get_feature_masks(), accessibility_level)
+            else:
+                allowed = self.accessibility_weights <= accessibility_level
+            self._allowed[accessibility_level] = allowed
+        return allowed
+
+    def get_nodes(self):
+        return list(self.names)
+
+    def degree(self, node_id):
+        return int(self.offsets[node_id + 1] - self.offsets[node_id])
+
+    def _get_heuristic_scale(self):
+        # Same bound as Graph: smallest weight / straight-line distance ratio over all edges
+        if self._heuristic_scale is None:
+            self._heuristic_scale = 0.0
+            if self.coordinates is not None and len(self.targets) and not np.isnan(self.coordinates).any():
+                sources = np.repeat(np.arange(len(self.names)), np.diff(self.offsets))
+                delta = self.coordinates[self.targets] - self.coordinates[sources]
+                distances = np.hypot(delta[:, 0], delta[:, 1])
+                positive = distances > 0
+                if positive.any():
+                    self._heuristic_scale = float(np.min(np.maximum(self.weights[positive], 0) / distances[positive]))
+        return self._heuristic_scale
+
+    def _heuristic_to(self, goal_id):
+        # Heuristic from every node to the goal, computed in one vectorized pass
+        scale = self._get_heuristic_scale()
+        if scale == 0:
+            return None
+        delta = self.coordinates - self.coordinates[goal_id]
+        return (scale * np.hypot(delta[:, 0], delta[:, 1])).tolist()
+
+    def shortest_path(self, start, end, accessibility_level):
+        if start not in self.ids or end not in self.ids:
+            return float('inf'), []
+        distance, path = self._astar_shortest_path(self.ids[start], self.ids[end], accessibility_level)
+        return distance, [self.names[node_id] for node_id in path]
+
+    def _astar_shortest_path(self, start, end, accessibility_level):
+        heuristic = self._heuristic_to(end)
+        allowed = self._get_allowed(accessibility_level)
+        offsets = self.offsets
+        distances = {start: 0}
+        parents = {}
+        self.expanded_nodes = 0
+
+        priority_queue = [(heuristic[start] if heuristic else 0, 0, start)]  # (f, g, node)
+        while priority_queue:
+            _, current_distance, current_node = heapq.heappop(priority_queue)
+            if current_distance > distances[current_node]:
+                continue
+            self.expanded_nodes += 1
+
+            if current_node == end:
+                path = [end]
+                while path[-1] != start:
+                    path.append(parents[path[-1]])
+                path.reverse()
+                return current_distance, path
+
+            lo, hi = offsets[current_node], offsets[current_node + 1]
+            for neighbor, weight, usable in zip(self.targets[lo:hi].tolist(),
+                                                self.weights[lo:hi].tolist(),
+                                                allowed[lo:hi].tolist()):
+                if usable:
+                    tentative_distance = current_distance + weight
+                    if tentative_distance < distances.get(neighbor, float('inf')):
+                        distances[neighbor] = tentative_distance
+                        parents[neighbor] = current_node
+                        f_score = tentative_distance + (heuristic[neighbor] if heuristic else 0)
+                        heapq.heappush(priority_queue, (f_score, tentative_distance, neighbor))
+
+        return float('inf'), []  # No path found
+
+    def nbytes(self):
+        """
+        Memory used by the edge and coordinate arrays, in bytes.
+        """
+        total = self.offsets.nbytes + self.targets.nbytes + self.weights.nbytes + self.accessibility_weights.nbytes
+        if self.coordinates is not None:
+            total += self.coordinates.nbytes
+        return total
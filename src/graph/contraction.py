@@ -0,0 +1,188 @@
+import heapq
+import itertools
+
+
+class ContractionHierarchy:
+    """
+    Contraction hierarchy of the subgraph usable at one accessibility level.
+    Nodes are contracted in order of importance, adding shortcut edges that keep
+    the distances between the remaining nodes. A query runs a bidirectional
+    Dijkstra that only goes up the hierarchy, then unpacks the shortcuts back
+    into the original sequence of rooms.
+    """
+
+    def __init__(self, graph, accessibility_level, witness_settle_limit=100):
+        self.accessibility_level = accessibility_level
+        self.witness_settle_limit = witness_settle_limit
+
+        # Every edge, original or shortcut: {(node1, node2): (weight, middle node or None)}
+        self.edges = {}
+        for node, neighbors in graph._get_level_view(accessibility_level).items():
+            for neighbor, weight in neighbors:
+                if node != neighbor and weight < self.edges.get((node, neighbor), (float('inf'), None))[0]:
+                    self.edges[(node, neighbor)] = (weight, None)
+
+        self.rank = {}
+        self._contract(graph.get_nodes())
+
+        # Edges going up the hierarchy, forward from the source and backward from the target
+        self.upward = dict((node, []) for node in self.rank)
+        self.downward = dict((node, []) for node in self.rank)
+        for (node1, node2), (weight, _) in self.edges.items():
+            if self.rank[node2] > self.rank[node1]:
+                self.upward[node1].append((node2, weight))
+            else:
+                self.downward[node2].append((node1, weight))
+
+        # Number of nodes settled by the last query
+        self.expanded_nodes = 0
+
+    # --------------------------- Preprocessing -------------------------- #
+
+    def _contract(self, nodes):
+        outgoing = dict((node, {}) for node in nodes)
+        incoming = dict((node, {}) for node in nodes)
+        for (node1, node2), (weight, _) in self.edges.items():
+            outgoing[node1][node2] = weight
+            incoming[node2][node1] = weight
+
+        contracted_neighbors = dict((node, 0) for node in nodes)
+        counter = itertools.count()
+        queue = [(self._priority(node, outgoing, incoming, contracted_neighbors), next(counter), node)
+                 for node in nodes]
+        heapq.heapify(queue)
+
+        while queue:
+            _, _, node = heapq.heappop(queue)
+
+            # Lazy update: contract the node only if it is still the least important one
+            priority = self._priority(node, outgoing, incoming, contracted_neighbors)
+            if queue and priority > queue[0][0]:
+                heapq.heappush(queue, (priority, next(counter), node))
+                continue
+
+            for node1, node2, weight in self._shortcuts(node, outgoing, incoming):
+                outgoing[node1][node2] = weight
+                incoming[node2][node1] = weight
+                self.edges[(node1, node2)] = (weight, node)
+
+            self.rank[node] = len(self.rank)
+            for neighbor in set(outgoing[node]) | set(incoming[node]):
+                contracted_neighbors[neighbor] += 1
+                outgoing[neighbor].pop(node, None)
+                incoming[neighbor].pop(node, None)
+            del outgoing[node]
+            del incoming[node]
+
+    def _priority(self, node, outgoing, incoming, contracted_neighbors):
+        # Edge difference: shortcuts added minus edges removed by contracting the node
+        shortcuts = len(self._shortcuts(node, outgoing, incoming))
+        return shortcuts - len(outgoing[node]) - len(incoming[node]) + contracted_neighbors[node]
+
+    def _shortcuts(self, node, outgoing, incoming):
+        shortcuts = []
+        for source, incoming_weight in incoming[node].items():
+            targets = dict((target, incoming_weight + outgoing_weight)
+                           for target, outgoing_weight in outgoing[node].items() if target != source)
+            if not targets:
+                continue
+            witnesses = self._witness_search(source, node, max(targets.values()), outgoing)
+            for target, weight in targets.items():
+                if witnesses.get(target, float('inf')) > weight:
+                    shortcuts.append((source, target, weight))
+        return shortcuts
+
+    def _witness_search(self, source, excluded, max_distance, outgoing):
+        # Bounded Dijkstra from source avoiding the node being contracted
+        distances = {source: 0}
+        priority_queue = [(0, source)]
+        settled = 0
+        while priority_queue and settled < self.witness_settle_limit:
+            current_distance, current_node = heapq.heappop(priority_queue)
+            if current_distance > distances[current_node]:
+                continue
+            if current_distance > max_distance:
+                break
+            settled += 1
+            for neighbor, weight in outgoing[current_node].items():
+                if neighbor == excluded:
+                    continue
+                tentative_distance = current_distance + weight
+                if tentative_distance < distances.get(neighbor, float('inf')):
+                    distances[neighbor] = tentative_distance
+                    heapq.heappush(priority_queue, (tentative_distance, neighbor))
+        return distances
+
+    # ------------------------------ Queries ----------------------------- #
+
+    def shortest_path(self, start, end):
+        if start not in self.rank or end not in self.rank:
+            return float('inf'), []
+        if start == end:
+            return 0, [start]
+
+        distances = ({start: 0}, {end: 0})
+        parents = ({}, {})
+        queues = ([(0, start)], [(0, end)])
+        adjacencies = (self.upward, self.downward)
+        best, meeting_node = float('inf'), None
+        self.expanded_nodes = 0
+
+        while queues[0] or queues[1]:
+            for direction in (0, 1):
+                queue = queues[direction]
+                # A direction stops once it cannot improve the best meeting point
+                if not queue or queue[0][0] >= best:
+                    del queue[:]
+                    continue
+
+                current_distance, current_node = heapq.heappop(queue)
+                if current_distance > distances[direction][current_node]:
+                    continue
+                self.expanded_nodes += 1
+
+                other_distance = distances[1 - direction].get(current_node)
+                if other_distance is not None and current_distance + other_distance < best:
+                    best, meeting_node = current_distance + other_distance, current_node
+
+                for neighbor, weight in adjacencies[direction][current_node]:
+                    tentative_distance = current_distance + weight
+                    if tentative_distance < distances[direction].get(neighbor, float('inf')):
+                        distances[direction][neighbor] = tentative_distance
+                        parents[direction][neighbor] = current_node
+                        heapq.heappush(queue, (tentative_distance, neighbor))
+
+        if meeting_node is None:
+            return float('inf'), []
+
+        # Hierarchy path: source up to the meeting node, then down to the target
+        hierarchy_path = [meeting_node]
+        while hierarchy_path[0] != start:
+            hierarchy_path.insert(0, parents[0][hierarchy_path[0]])
+        while hierarchy_path[-1] != end:
+            hierarchy_path.append(parents[1][hierarchy_path[-1]])
+
+        path = [start]
+        for node1, node2 in zip(hierarchy_path, hierarchy_path[1:]):
+            self._unpack(node1, node2, path)
+        return best, path
+
+    def _unpack(self, node1, node2, path):
+        # Replace a shortcut with the two edges it skips, recursively; appends up to node2
+        stack = [(node1, node2)]
+        while stack:
+            node1, node2 = stack.pop()
+            middle = self.edges[(node1, node2)][1]
+            if middle is None:
+                path.append(node2)
+            else:
+                stack.append((middle, node2))
+                stack.append((node1, middle))
+
+
+def build_contraction_hierarchies(graph, witness_settle_limit=100):
+    """
+    One contraction hierarchy per accessibility level found in the graph.
+    """
+    return dict((level, ContractionHierarchy(graph, level, witness_settle_limit))
+                for level in graph.level_edge_counts())
@@ -0,0 +1,114 @@
+import math
+import threading
+
+
+class EdgeWeightLearner(object):
+    """
+    Learns the cost of the corridors from the time the robot takes to traverse them.
+    Each edge keeps an exponential moving average of its traversal time. The learned
+    weight of an edge is its average time converted to weight units, with the ratio
+    between the total time and the total original weight of the learned edges, so the
+    learned weights stay on the same scale as the hand-entered ones.
+    """
+
+    def __init__(self, directed=False, alpha=0.2, min_samples=3):
+        self.directed = directed
+        self.alpha = alpha
+        self.min_samples = min_samples
+
+        # {(node1, node2): [average seconds, samples]}, node1 <= node2 if undirected
+        self.averages = {}
+        # Weight of each learned edge before learning: {(node1, node2): weight}
+        self.base_weights = {}
+
+        # Recording and applying may run on different threads (see routing_service.py)
+        self._lock = threading.Lock()
+
+    def _key(self, node1, node2):
+        if not self.directed and node2 < node1:
+            return node2, node1
+        return node1, node2
+
+    def record(self, node1, node2, duration):
+        with self._lock:
+            entry = self.averages.setdefault(self._key(node1, node2), [duration, 0])
+            entry[0] += self.alpha * (duration - entry[0])
+            entry[1] += 1
+
+    def record_leg(self, nodes, duration, room_mapper):
+        """
+        Record the duration of a motion leg through several nodes, split among its
+        edges in proportion to their straight-line length.
+        """
+        points = [room_mapper[node] for node in nodes]
+        lengths = [math.hypot(x2 - x1, y2 - y1) for (x1, y1), (x2, y2) in zip(points, points[1:])]
+        total = sum(lengths)
+        for node1, node2, length in zip(nodes, nodes[1:], lengths):
+            self.record(node1, node2, duration * (length / total if total > 0 else 1.0 / len(lengths)))
+
+    def learned_weights(self, graph):
+        """
+        (node1, node2, weight) for every edge of graph with enough samples.
+        """
+        with self._lock:
+            learned = []
+            for (node1, node2), (average, samples) in self.averages.items():
+                if samples < self.min_samples:
+                    continue
+                if (node1, node2) not in self.base_weights:
+                    weights = [weight for neighbor, weight, _ in graph.adjacency_list.get(node1, []) if neighbor == node2]
+                    if not weights:
+                        continue
+                    self.base_weights[(node1, node2)] = min(weights)
+                learned.append((node1, node2, average))
+
+            total_weight = sum(self.base_weights[(node1, node2)] for node1, node2, _ in learned)
+            total_time = sum(average for _, _, average in learned)
+            if total_time <= 0:
+                return []
+            return [(node1, node2, average * total_weight / total_time) for node1, node2, average in learned]
+
+    def changed_weights(self, graph):
+        """
+        The learned weights that differ from the current weights of graph.
+        """
+        changed = []
+        for node1, node2, weight in self.learned_weights(graph):
+            if any(other_weight != weight
+                   for neighbor, other_weight, _ in graph.adjacency_list.get(node1, []) if neighbor == node2):
+                changed.append((node1, node2, weight))
+        return changed
+
+    def apply(self, graph):
+        """
+        Set the learned weights on graph. Returns the number of edges changed.
+        """
+        changed = self.changed_weights(graph)
+        for node1, node2, weight in changed:
+            graph.set_weight(node1, node2, weight)
+        return len(changed)
+
+    def save(self, path):
+        with self._lock:
+            with open(path, 'w') as file:
+                for (node1, node2), (average, samples) in self.averages.items():
+                    file.write(str(node1) + " " + str(node2) + " " + repr(average) + " " + str(samples) + " " +
+                               repr(self.base_weights.get((node1, node2), 0)) + "\n")
+
+    def load(self, path):
+        with self._lock:
+            self.averages, self.base_weights = {}, {}
+            with open(path, 'r') as file:
+                for line in file:
+                    if not line.strip():
+                        continue
+                    node1, node2, average, samples, base_weight = line.split()
+                    self.averages[(node1, node2)] = [float(average), int(samples)]
+                    if float(base_weight) > 0:
+                        self.base_weights[(node1, node2)] = float(base_weight)
+
+    @classmethod
+    def static_load(cls, path, directed=False):
+        learner = cls(directed=directed)
+        learner.load(path)
+        return learner
@@ -0,0 +1,128 @@
+import numpy as np
+
+# Barrier features of a corridor, one bit each. A user is described by the Capabilities
+# mask of the barriers they can pass, and may use a corridor when every barrier of the
+# corridor is in it: (features & ~capabilities) == 0.
+STAIRS = 1
+STEPS = 2
+NARROW_DOOR = 4
+SLOPE = 8
+HEAVY_DOOR = 16
+FEATURES = {
+    'stairs': STAIRS,
+    'steps': STEPS,
+    'narrow_door': NARROW_DOOR,
+    'slope': SLOPE,
+    'heavy_door': HEAVY_DOOR,
+}
+ALL_FEATURES = STAIRS | STEPS | NARROW_DOOR | SLOPE | HEAVY_DOOR
+
+# Compatibility with the integer accessibility weights and levels: the barriers implied by
+# the accessibility weight of a corridor that lists no features, and the ones a user of an
+# accessibility level can pass. Any non-zero weight may be stairs, as in graph.txt and
+# building.STAIRS_ACCESSIBILITY_WEIGHT, so a user who cannot climb stairs never gets those
+# corridors. The masks are nested, so up to the last entry a level allows the same
+# corridors as comparing the weights; higher values map to the last one.
+LEVEL_FEATURES = [
+    0,
+    STAIRS | HEAVY_DOOR | SLOPE,
+    STAIRS | HEAVY_DOOR | SLOPE | NARROW_DOOR,
+    ALL_FEATURES,
+]
+
+
+def feature_mask(names):
+    """
+    Bitmask of a list of feature names. Raises ValueError on an unknown name.
+    """
+    mask = 0
+    for name in names:
+        if name not in FEATURES:
+            raise ValueError("Unknown barrier feature: " + str(name) + " (known: " +
+                             ", ".join(sorted(FEATURES)) + ")")
+        mask |= FEATURES[name]
+    return mask
+
+
+def feature_names(mask):
+    return sorted(name for name, bit in FEATURES.items() if mask & bit)
+
+
+def level_mask(level):
+    return LEVEL_FEATURES[max(0, min(level, len(LEVEL_FEATURES) - 1))]
+
+
+class Capabilities(object):
+    """
+    The barrier features a user can pass. Accepted wherever an accessibility level is,
+    and hashable, so the filtered views are cached per distinct mask.
+    """
+
+    __slots__ = ('mask',)
+
+    def __init__(self, mask=0):
+        self.mask = mask & ALL_FEATURES
+
+    @classmethod
+    def from_names(cls, names):
+        return cls(feature_mask(names))
+
+    @classmethod
+    def from_level(cls, level):
+        return cls(level_mask(level))
+
+    @property
+    def names(self):
+        return feature_names(self.mask)
+
+    def allows(self, mask):
+        return not mask & ~self.mask
+
+    def __eq__(self, other):
+        return isinstance(other, Capabilities) and self.mask == other.mask
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(('capabilities', self.mask))
+
+    def __repr__(self):
+        return "Capabilities(" + ", ".join(self.names) + ")"
+
+
+def parse_level(value):
+    """
+    Accessibility level from a command line or a request: an integer level, or the
+    feature names (a list, or a comma-separated string) of a Capabilities.
+    """
+    if isinstance(value, int):
+        return value
+    if isinstance(value, (list, tuple)):
+        return Capabilities.from_names(value)
+    try:
+        return int(value)
+    except ValueError:
+        return Capabilities.from_names([name.strip() for name in value.split(',') if name.strip()])
+
+
+def edge_masks(accessibility_weights, explicit=None):
+    """
+    Feature mask of every edge, as an int array: the mask of the accessibility weight
+    (see LEVEL_FEATURES) where the edge lists no features, else the listed ones.
+    explicit maps edge positions to their feature masks.
+    """
+    weights = np.clip(np.asarray(accessibility_weights, dtype=np.int64), 0, len(LEVEL_FEATURES) - 1)
+    masks = np.array(LEVEL_FEATURES, dtype=np.int64)[weights]
+    if explicit:
+        positions = np.array(list(explicit.keys()), dtype=np.int64)
+        masks[positions] = np.array(list(explicit.values()), dtype=np.int64)
+    return masks
+
+
+def allowed_edges(masks, capabilities):
+    """
+    Boolean array of the edges whose features the capabilities can pass, in one
+    bitwise pass over the mask array.
+    """
+    return (masks & ~np.int64(capabilities.mask)) == 0
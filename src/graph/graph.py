@@ -1,8 +1,16 @@
-import matplotlib.pyplot as plt
 import heapq
+import itertools
+import math
+import threading
+from collections import OrderedDict
 
+from .features import Capabilities, allowed_edges, edge_masks, feature_mask
+from .reachability import ReachabilityIndex
 
-class Node:
+
+class Node(object):
+
+    __slots__ = ('value',)
 
     def __init__(self, value):
         self.value = value
@@ -28,10 +36,67 @@ class Node:
 
 class Graph:
 
-    def __init__(self, directed=False):
+    def __init__(self, directed=False, coordinates=None):
         self.adjacency_list = {}
         self.directed = directed
 
+        # Position of the entries of each corridor in the adjacency list, built per node on
+        # its first edit (see _get_slots): {node: {neighbor: [index]}}
+        self._edge_slots = {}
+
+        # Corridors listed in the two directions with different values by the last load:
+        # [(node1, node2, entries node1 -> node2, entries node2 -> node1)]
+        self.asymmetric_edges = []
+
+        # Barrier features listed for a corridor: {(node1, node2): bitmask} (see features.py).
+        # The other corridors get the features implied by their accessibility weight.
+        self.edge_features = {}
+
+        # Optional coordinate source (a RoomMapper or a dict of name -> (x, y)) for the A* heuristic
+        self.coordinates = coordinates
+        self._heuristic_scale = None
+
+        # Number of nodes expanded by the last search
+        self.expanded_nodes = 0
+
+        # Optional precomputed all-pairs route table (see route_table.RouteTable)
+        self.route_table = None
+
+        # Optional contraction hierarchies, one per accessibility level (see contraction.py)
+        self.contraction_hierarchies = None
+
+        # Optional landmark distances for the A* heuristic (see landmarks.Landmarks)
+        self.landmarks = None
+
+        # Components per accessibility level, built on the first query (see reachability.py)
+        self.reachability = None
+
+        # Adjacency filtered by accessibility level or Capabilities, built lazily:
+        # {level: {node: [(neighbor, weight)]}}
+        self._level_views = {}
+
+        # All the edges as flat lists and a feature mask array, to filter them for a Capabilities
+        self._edge_arrays = None
+        self._reverse_level_views = {}
+
+        # Alternative routes: {(start, end, accessibility_level): (k requested, [(distance, path)])}
+        self._alternatives = {}
+
+        # Bumped by every change of the edges; cached results of older versions are not used
+        self.version = 0
+
+        # Reverse shortest path trees of the most recent destinations, least recently used first:
+        # {(destination, accessibility_level): (version, distances, next hops towards the destination)}
+        self.path_tree_capacity = 16
+        self.path_tree_hits = 0
+        self.path_tree_misses = 0
+        self._path_trees = OrderedDict()
+        self._path_trees_lock = threading.Lock()
+
+        # Destinations asked for without a cached tree, least recently used first: a tree is
+        # built for a destination only when it is asked for again, {(destination, accessibility_level): None}
+        self._requested_destinations = OrderedDict()
+
     def add(self, node1, node2, weight=1, accessibility_weight=1):
         # If one of the nodes is not in the adjacency list, add it
         if node1 not in self.adjacency_list:
@@ -39,60 +104,725 @@ class Graph:
         if node2 not in self.adjacency_list:
             self.adjacency_list[node2] = []
 
-        self.adjacency_list[node1].append((node2, weight, accessibility_weight))
+        changed = self._add_entry(node1, node2, weight, accessibility_weight)
+        if not self.directed:
+            changed = self._add_entry(node2, node1, weight, accessibility_weight) or changed
+
+        if changed:
+            self._invalidate_caches()
+
+    def add_edges(self, edges):
+        """
+        Add (node1, node2, weight, accessibility_weight) edges in bulk, with the same result
+        as adding them one by one: the entries of each corridor are collected in a dict
+        keyed by (node, neighbor), once per corridor if the graph is undirected, and reduced
+        once to the ones no other entry beats (see _add_entry). The caches are invalidated once.
+        """
+        # {(node, neighbor): (weight, accessibility_weight), or a list of them if they differ}
+        candidates = {}
+        undirected = not self.directed
+
+        def collect(entries):
+            added = False
+            for node1, node2, weight, accessibility_weight in entries:
+                key = (node2, node1) if undirected and node2 < node1 else (node1, node2)
+                entry = (weight, accessibility_weight)
+                listed = candidates.get(key)
+                if listed is None:
+                    candidates[key] = entry
+                elif type(listed) is list:
+                    listed.append(entry)
+                elif listed != entry:
+                    candidates[key] = [listed, entry]
+                added = True
+            return added
+
+        collect((node, neighbor, weight, accessibility_weight)
+                for node, neighbors in self.adjacency_list.items()
+                for neighbor, weight, accessibility_weight in neighbors)
+        if not collect(edges):
+            return
+
+        adjacency_list = dict((node, []) for node in self.adjacency_list)
+        for (node, neighbor), listed in candidates.items():
+            if node not in adjacency_list:
+                adjacency_list[node] = []
+            if neighbor not in adjacency_list:
+                adjacency_list[neighbor] = []
+            if type(listed) is tuple:
+                kept = [listed]
+            else:
+                # Sorted by weight, an entry survives if its accessibility weight is lower than
+                # the one of every shorter entry
+                kept = []
+                for weight, accessibility_weight in sorted(set(listed)):
+                    if not kept or accessibility_weight < kept[-1][1]:
+                        kept.append((weight, accessibility_weight))
+            for weight, accessibility_weight in kept:
+                adjacency_list[node].append((neighbor, weight, accessibility_weight))
+                if undirected and neighbor != node:
+                    adjacency_list[neighbor].append((node, weight, accessibility_weight))
+
+        self.adjacency_list = adjacency_list
+        self._edge_slots = {}
+        self._invalidate_caches()
+
+    def _get_slots(self, node):
+        slots = self._edge_slots.get(node)
+        if slots is None:
+            slots = self._edge_slots[node] = {}
+            for i, (neighbor, _, _) in enumerate(self.adjacency_list.get(node, [])):
+                slots.setdefault(neighbor, []).append(i)
+        return slots
+
+    def _add_entry(self, node, neighbor, weight, accessibility_weight):
+        """
+        Store the edge node -> neighbor once. A duplicate is dropped if another entry of the
+        same corridor has a weight and an accessibility weight both no greater, and replaces
+        the entries it beats in the same way. Usually this keeps one entry with the minimum
+        weight; two entries remain only if the shorter one has the higher accessibility weight,
+        since each is the best one at some accessibility level.
+        Returns whether the adjacency list changed.
+        """
+        neighbors = self.adjacency_list[node]
+        slots = self._get_slots(node).setdefault(neighbor, [])
+        if any(neighbors[i][1] <= weight and neighbors[i][2] <= accessibility_weight for i in slots):
+            return False
+
+        dominated = [i for i in slots if weight <= neighbors[i][1] and accessibility_weight <= neighbors[i][2]]
+        if not dominated:
+            slots.append(len(neighbors))
+            neighbors.append((neighbor, weight, accessibility_weight))
+            return True
+
+        neighbors[dominated[0]] = (neighbor, weight, accessibility_weight)
+        if len(dominated) > 1:
+            for i in reversed(dominated[1:]):
+                del neighbors[i]
+            # The entries after the deleted ones moved
+            del self._edge_slots[node]
+        return True
+
+    def remove(self, node1, node2):
+        """
+        Remove the edge between two nodes (in both directions if the graph is undirected).
+        Returns the removed (weight, accessibility_weight) entries of node1 -> node2.
+        """
+        removed = self._remove_entries(node1, node2)
+        if not self.directed:
+            self._remove_entries(node2, node1)
+        self._invalidate_caches()
+        return removed
+
+    def set_weight(self, node1, node2, weight):
+        """
+        Change the weight of the edge between two nodes (in both directions if the graph
+        is undirected), keeping its accessibility weights.
+        """
+        for node, neighbor in ((node1, node2), (node2, node1)) if not self.directed else ((node1, node2),):
+            for _, accessibility_weight in self._remove_entries(node, neighbor):
+                self._add_entry(node, neighbor, weight, accessibility_weight)
+        self._invalidate_caches()
+
+    def set_features(self, node1, node2, features):
+        """
+        Set the barrier features of the corridor between two nodes (in both directions if
+        the graph is undirected), as a list of feature names or a bitmask.
+        """
+        mask = features if isinstance(features, int) else feature_mask(features)
+        self.edge_features[(node1, node2)] = mask
         if not self.directed:
-            self.adjacency_list[node2].append((node1, weight, accessibility_weight))
+            self.edge_features[(node2, node1)] = mask
+        self._invalidate_caches()
+
+    def _remove_entries(self, node, neighbor):
+        if neighbor not in self._get_slots(node):
+            return []
+        removed = [(weight, accessibility_weight)
+                   for other_neighbor, weight, accessibility_weight in self.adjacency_list[node]
+                   if other_neighbor == neighbor]
+        self.adjacency_list[node] = [entry for entry in self.adjacency_list[node] if entry[0] != neighbor]
+        del self._edge_slots[node]
+        return removed
+
+    def copy(self):
+        """
+        Copy of the graph that can be changed without affecting this one. The coordinates
+        are shared, the caches and the attached route tables are not copied.
+        """
+        graph = Graph(directed=self.directed, coordinates=self.coordinates)
+        graph.adjacency_list = dict((node, list(neighbors)) for node, neighbors in self.adjacency_list.items())
+        graph.asymmetric_edges = list(self.asymmetric_edges)
+        graph.edge_features = dict(self.edge_features)
+        return graph
+
+    def _invalidate_caches(self):
+        self.version += 1
+
+        # A new edge may be shorter than the straight line between its nodes
+        self._heuristic_scale = None
+
+        # The precomputed routes and the filtered views no longer describe this graph
+        self.route_table = None
+        self.contraction_hierarchies = None
+        self.landmarks = None
+        self.reachability = None
+        self._level_views = {}
+        self._reverse_level_views = {}
+        self._edge_arrays = None
+        self._alternatives = {}
+        if self._path_trees:
+            self._path_trees = OrderedDict()
 
     def get_nodes(self):
         return list(self.adjacency_list.keys())
 
     def load(self, path):
+        # Entries as listed in the file: {(node1, node2): (weight, accessibility_weight),
+        # or the set of them if several}
+        listed = {}
+        edges = []
         with open(path, 'r') as file:
             for line in file:
                 node1, node2, weight, accessibility_weight = line.split()  # Each line has node1, node2, weight, and accessibility_weight separated by tab
-                self.add(node1, node2, int(weight), int(accessibility_weight))
+                entry = (int(weight), int(accessibility_weight))
+                edges.append((node1, node2) + entry)
+                previous = listed.get((node1, node2))
+                if previous is None:
+                    listed[(node1, node2)] = entry
+                elif type(previous) is set:
+                    previous.add(entry)
+                elif previous != entry:
+                    listed[(node1, node2)] = set([previous, entry])
+        self.add_edges(edges)
+
+        # An undirected corridor listed in both directions should have the same values in both
+        self.asymmetric_edges = []
+        if not self.directed:
+            for (node1, node2), entries in listed.items():
+                reverse_entries = listed.get((node2, node1))
+                if node1 < node2 and reverse_entries is not None and reverse_entries != entries:
+                    entries = entries if type(entries) is set else set([entries])
+                    reverse_entries = reverse_entries if type(reverse_entries) is set else set([reverse_entries])
+                    if entries != reverse_entries:
+                        self.asymmetric_edges.append((node1, node2, sorted(entries), sorted(reverse_entries)))
 
     @classmethod
-    def static_load(cls, path):
-        graph = Graph()
+    def static_load(cls, path, coordinates=None):
+        graph = Graph(coordinates=coordinates)
         graph.load(path)
         return graph
 
+    def set_coordinates(self, coordinates):
+        self.coordinates = coordinates
+        self._heuristic_scale = None
+
     def save(self, path):
         with open(path, 'w') as file:
             for node, neighbors in self.adjacency_list.items():
                 for neighbor, weight, accessibility_weight in neighbors:
                     file.write(str(node) + " " + str(neighbor) + " " + str(weight) + " " + str(accessibility_weight) + "\n")
 
-    def shortest_path(self, start, end, accessibility_level):
+    def _get_level_view(self, accessibility_level):
+        view = self._level_views.get(accessibility_level)
+        if view is None and isinstance(accessibility_level, Capabilities):
+            view = self._get_capability_view(accessibility_level)
+        elif view is None:
+            view = {}
+            for node, neighbors in self.adjacency_list.items():
+                view[node] = [(neighbor, weight)
+                              for neighbor, weight, accessibility_weight in neighbors
+                              if accessibility_weight <= accessibility_level]
+            self._level_views[accessibility_level] = view
+        return view
+
+    def _get_capability_view(self, capabilities):
+        sources, targets, weights, masks = self._get_edge_arrays()
+        view = dict((node, []) for node in self.adjacency_list)
+        for i in allowed_edges(masks, capabilities).nonzero()[0].tolist():
+            view[sources[i]].append((targets[i], weights[i]))
+        self._level_views[capabilities] = view
+        return view
+
+    def _get_edge_arrays(self):
+        if self._edge_arrays is None:
+            sources, targets, weights, accessibility_weights, explicit = [], [], [], [], {}
+            for node, neighbors in self.adjacency_list.items():
+                for neighbor, weight, accessibility_weight in neighbors:
+                    if (node, neighbor) in self.edge_features:
+                        explicit[len(sources)] = self.edge_features[(node, neighbor)]
+                    sources.append(node)
+                    targets.append(neighbor)
+                    weights.append(weight)
+                    accessibility_weights.append(accessibility_weight)
+            self._edge_arrays = (sources, targets, weights, edge_masks(accessibility_weights, explicit))
+        return self._edge_arrays
+
+    def _get_reverse_level_view(self, accessibility_level):
+        # Edges entering each node; an undirected graph is its own reverse
+        if not self.directed:
+            return self._get_level_view(accessibility_level)
+        view = self._reverse_level_views.get(accessibility_level)
+        if view is None:
+            view = dict((node, []) for node in self.adjacency_list)
+            for node, neighbors in self._get_level_view(accessibility_level).items():
+                for neighbor, weight in neighbors:
+                    view[neighbor].append((node, weight))
+            self._reverse_level_views[accessibility_level] = view
+        return view
+
+    def level_edge_counts(self):
+        """
+        Number of directed edges usable at each accessibility level found in the graph,
+        to see how much each level prunes.
+        """
+        levels = sorted(set(accessibility_weight
+                            for neighbors in self.adjacency_list.values()
+                            for _, _, accessibility_weight in neighbors))
+        return dict((level, sum(len(neighbors) for neighbors in self._get_level_view(level).values()))
+                    for level in levels)
+
+    def _get_reachability(self):
+        if self.reachability is None:
+            self.reachability = ReachabilityIndex(self)
+        return self.reachability
+
+    def reachable(self, start, end, accessibility_level):
+        return self._get_reachability().reachable(start, end, accessibility_level)
+
+    def minimum_level(self, start, end):
+        """
+        The lowest accessibility level at which end can be reached from start, or None.
+        """
+        return self._get_reachability().minimum_level(start, end)
+
+    def attach_route_table(self, route_table):
+        self.route_table = route_table
+
+    def attach_contraction_hierarchies(self, contraction_hierarchies):
+        self.contraction_hierarchies = contraction_hierarchies
+
+    def attach_landmarks(self, landmarks):
+        self.landmarks = landmarks
+
+    def shortest_path(self, start, end, accessibility_level, algorithm=None):
+        """
+        Shortest path using only the edges with accessibility weight up to accessibility_level,
+        or, if it is a Capabilities, only the edges whose barrier features it can pass.
+        algorithm is 'astar', 'bidirectional' or 'tree' (walk the cached shortest path tree
+        of the destination). By default the attached route table answers if present, then
+        a tree already cached for the destination, then the contraction hierarchies if
+        attached. Otherwise the first query to a destination runs A*, and the tree of the
+        destination is computed and cached when it is asked for again.
+        Requests with no accessible route return (inf, []) without searching.
+        """
+        if not self.reachable(start, end, accessibility_level):
+            self.expanded_nodes = 0
+            return float('inf'), []
+
+        if algorithm == 'astar':
+            return self._astar_shortest_path(start, end, accessibility_level)
+        if algorithm == 'bidirectional':
+            return self._bidirectional_shortest_path(start, end, accessibility_level)
+        if algorithm == 'tree':
+            return self._tree_shortest_path(start, end, accessibility_level)
+        if algorithm is not None:
+            raise ValueError("Unknown shortest path algorithm: " + str(algorithm))
+
+        # The route table and the hierarchies are built per integer level
+        by_level = not isinstance(accessibility_level, Capabilities)
+        if by_level and self.route_table is not None and self.route_table.covers(start, end):
+            return self.route_table.shortest_path(start, end, accessibility_level)
+        if self._has_path_tree(end, accessibility_level):
+            return self._tree_shortest_path(start, end, accessibility_level)
+        if by_level and self.contraction_hierarchies is not None:
+            # The subgraph of a level is the one of the highest level with a hierarchy below it
+            levels = [level for level in self.contraction_hierarchies if level <= accessibility_level]
+            if levels:
+                return self.contraction_hierarchies[max(levels)].shortest_path(start, end)
+        if self._repeated_destination(end, accessibility_level):
+            return self._tree_shortest_path(start, end, accessibility_level)
         return self._astar_shortest_path(start, end, accessibility_level)
 
-    def _astar_shortest_path(self, start, end, accessibility_level):
-        priority_queue = [(0, start)]  # (f, node)
+    def _repeated_destination(self, destination, accessibility_level):
+        # Whether the destination was asked for recently, recording it otherwise
+        key = (destination, accessibility_level)
+        with self._path_trees_lock:
+            if key in self._requested_destinations:
+                del self._requested_destinations[key]
+                return True
+            self._requested_destinations[key] = None
+            while len(self._requested_destinations) > 4 * self.path_tree_capacity:
+                self._requested_destinations.popitem(last=False)
+            return False
+
+    def _has_path_tree(self, destination, accessibility_level):
+        entry = self._path_trees.get((destination, accessibility_level))
+        return entry is not None and entry[0] == self.version
+
+    def _get_path_tree(self, destination, accessibility_level):
+        """
+        Distances to the destination and next hops towards it from every node that can
+        reach it, computed with one Dijkstra on the reversed edges and kept in an LRU cache.
+        """
+        key = (destination, accessibility_level)
+        with self._path_trees_lock:
+            entry = self._path_trees.get(key)
+            if entry is not None and entry[0] == self.version:
+                self.path_tree_hits += 1
+                self.expanded_nodes = 0
+                # Most recently used last
+                del self._path_trees[key]
+                self._path_trees[key] = entry
+                return entry[1], entry[2]
+            self.path_tree_misses += 1
+
+        version = self.version
+        distances, next_hops = self._dijkstra(destination, accessibility_level, reverse=True)
+        self.expanded_nodes = len(distances)
+        with self._path_trees_lock:
+            self._path_trees.pop(key, None)
+            self._path_trees[key] = (version, distances, next_hops)
+            while len(self._path_trees) > self.path_tree_capacity:
+                self._path_trees.popitem(last=False)
+        return distances, next_hops
+
+    def _tree_shortest_path(self, start, end, accessibility_level):
+        distances, next_hops = self._get_path_tree(end, accessibility_level)
+        if start not in distances:
+            return float('inf'), []
+
+        path = [start]
+        while path[-1] != end:
+            path.append(next_hops[path[-1]])
+        return distances[start], path
+
+    def path_tree_stats(self):
+        """
+        Hits, misses and size of the shortest path tree cache.
+        """
+        return {'hits': self.path_tree_hits, 'misses': self.path_tree_misses,
+                'size': len(self._path_trees), 'capacity': self.path_tree_capacity}
+
+    def shortest_paths_batch(self, queries, method='auto'):
+        """
+        Answer many (start, end, accessibility_level) queries at once. Queries are grouped
+        by level and start so that each start needs a single search. With method
+        'floyd_warshall' (or 'auto' on small maps with many starts per level) the
+        all-pairs distances of a level are computed with a vectorized Floyd-Warshall.
+        Returns the (distance, path) pairs in the order of the queries.
+        """
+        groups = {}
+        for i, (start, end, accessibility_level) in enumerate(queries):
+            groups.setdefault(accessibility_level, {}).setdefault(start, []).append((i, end))
+
+        results = [None] * len(queries)
+        for accessibility_level, sources in groups.items():
+            use_floyd_warshall = method == 'floyd_warshall' or (
+                method == 'auto' and len(self.adjacency_list) <= 300 and 4 * len(sources) >= len(self.adjacency_list))
+
+            if use_floyd_warshall:
+                nodes, distances, next_hops = self._floyd_warshall(accessibility_level)
+                index = dict((node, i) for i, node in enumerate(nodes))
+                for start, targets in sources.items():
+                    for i, end in targets:
+                        results[i] = self._walk_next_hops(nodes, index, distances, next_hops, start, end)
+            else:
+                for start, targets in sources.items():
+                    distances, parents = self._dijkstra(start, accessibility_level, [end for _, end in targets])
+                    for i, end in targets:
+                        if distances.get(end, float('inf')) == float('inf'):
+                            results[i] = float('inf'), []
+                        else:
+                            results[i] = distances[end], self._reconstruct_path(parents, start, end)
+        return results
+
+    def _dijkstra(self, start, accessibility_level, targets=None, reverse=False, excluded_edges=None):
+        """
+        Single-source Dijkstra on the subgraph of a level, or on its reversed edges if
+        reverse is set, skipping the (node1, node2) edges in excluded_edges. If targets
+        are given, stop as soon as all of them are settled.
+        Returns the distances and parents found.
+        """
+        if reverse:
+            adjacency = self._get_reverse_level_view(accessibility_level)
+        else:
+            adjacency = self._get_level_view(accessibility_level)
+        distances = {start: 0}
+        parents = {}
+        remaining = set(targets) if targets is not None else None
+        priority_queue = [(0, start)]
+
+        while priority_queue:
+            current_distance, current_node = heapq.heappop(priority_queue)
+            if current_distance > distances[current_node]:
+                continue
+
+            if remaining is not None:
+                remaining.discard(current_node)
+                if not remaining:
+                    break
+
+            for neighbor, weight in adjacency.get(current_node, []):
+                if excluded_edges and ((neighbor, current_node) if reverse else (current_node, neighbor)) in excluded_edges:
+                    continue
+                tentative_distance = current_distance + weight
+                if tentative_distance < distances.get(neighbor, float('inf')):
+                    distances[neighbor] = tentative_distance
+                    parents[neighbor] = current_node
+                    heapq.heappush(priority_queue, (tentative_distance, neighbor))
+
+        return distances, parents
+
+    def _floyd_warshall(self, accessibility_level):
+        # NumPy is only needed for dense batch planning
+        import numpy as np
+
+        nodes = self.get_nodes()
+        index = dict((node, i) for i, node in enumerate(nodes))
+        distances = np.full((len(nodes), len(nodes)), np.inf)
+        next_hops = np.full((len(nodes), len(nodes)), -1, dtype=np.int64)
+        np.fill_diagonal(distances, 0)
+        np.fill_diagonal(next_hops, np.arange(len(nodes)))
+
+        for node, neighbors in self._get_level_view(accessibility_level).items():
+            for neighbor, weight in neighbors:
+                i, j = index[node], index[neighbor]
+                if weight < distances[i, j]:
+                    distances[i, j] = weight
+                    next_hops[i, j] = j
+
+        for k in range(len(nodes)):
+            through_k = distances[:, k, None] + distances[None, k, :]
+            shorter = through_k < distances
+            distances = np.where(shorter, through_k, distances)
+            next_hops = np.where(shorter, next_hops[:, k, None], next_hops)
+
+        return nodes, distances, next_hops
+
+    def _walk_next_hops(self, nodes, index, distances, next_hops, start, end):
+        if start not in index or end not in index:
+            return float('inf'), []
+        source, target = index[start], index[end]
+        if next_hops[source, target] == -1:
+            return float('inf'), []
+
+        path = [nodes[source]]
+        current = source
+        while current != target:
+            current = int(next_hops[current, target])
+            path.append(nodes[current])
+        return float(distances[source, target]), path
+
+    def k_shortest_paths(self, start, end, accessibility_level, k):
+        """
+        Up to k loopless routes from start to end, shortest first, found with Yen's
+        algorithm. The first one is the shortest path. Routes are cached per
+        (start, end, accessibility_level), so once computed, switching to a fallback
+        route costs no search.
+        """
+        key = (start, end, accessibility_level)
+        cached = self._alternatives.get(key)
+        if cached is not None and (len(cached[1]) >= k or cached[0] >= k):
+            return cached[1][:k]
+
+        if not self.reachable(start, end, accessibility_level):
+            self._alternatives[key] = (k, [])
+            return []
+
+        distance, path = self._astar_shortest_path(start, end, accessibility_level)
+        if not path:
+            self._alternatives[key] = (k, [])
+            return []
+
+        adjacency = self._get_level_view(accessibility_level)
+        routes = [(distance, path)]
+        seen = set([tuple(path)])
+        candidates = []
+        counter = itertools.count()
+
+        while len(routes) < k:
+            previous_path = routes[-1][1]
+            root_distance = 0
+            for i in range(len(previous_path) - 1):
+                spur_node = previous_path[i]
+                root_path = previous_path[:i + 1]
+
+                # Leave out the edges that the routes found so far take after the same root,
+                # and the nodes of the root so that the new route stays loopless
+                excluded_edges = set((route[i], route[i + 1]) for _, route in routes
+                                     if len(route) > i + 1 and route[:i + 1] == root_path)
+                excluded_nodes = set(root_path[:-1])
+
+                spur_distance, spur_path = self._astar_shortest_path(spur_node, end, accessibility_level,
+                                                                     excluded_nodes, excluded_edges)
+                if spur_path:
+                    candidate = root_path[:-1] + spur_path
+                    if tuple(candidate) not in seen:
+                        seen.add(tuple(candidate))
+                        heapq.heappush(candidates, (root_distance + spur_distance, next(counter), candidate))
+
+                root_distance += min(weight for neighbor, weight in adjacency[spur_node]
+                                     if neighbor == previous_path[i + 1])
+
+            if not candidates:
+                break
+            candidate_distance, _, candidate = heapq.heappop(candidates)
+            routes.append((candidate_distance, candidate))
+
+        self._alternatives[key] = (k, routes)
+        return routes
+
+    def _astar_shortest_path(self, start, end, accessibility_level, excluded_nodes=None, excluded_edges=None):
+        adjacency = self._get_level_view(accessibility_level)
+        priority_queue = [(self._heuristic(start, end, accessibility_level), 0, start)]  # (f, g, node)
         distances = {node: float('inf') for node in self.adjacency_list}
         distances[start] = 0
         parents = {}
+        self.expanded_nodes = 0
 
         while priority_queue:
-            _, current_node = heapq.heappop(priority_queue)
+            _, current_distance, current_node = heapq.heappop(priority_queue)
+
+            # Skip stale queue entries for nodes we already reached through a shorter path
+            if current_distance > distances[current_node]:
+                continue
+            self.expanded_nodes += 1
 
             if current_node == end:
                 return distances[end], self._reconstruct_path(parents, start, end)
 
-            for neighbor, weight, accessibility_weight in self.adjacency_list[current_node]:
-                if accessibility_weight <= accessibility_level:
-                    tentative_distance = distances[current_node] + weight
-                    if tentative_distance < distances[neighbor]:
-                        distances[neighbor] = tentative_distance
-                        parents[neighbor] = current_node
-                        heuristic = self._heuristic(neighbor, end)
-                        f_score = tentative_distance + heuristic
-                        heapq.heappush(priority_queue, (f_score, neighbor))
+            for neighbor, weight in adjacency[current_node]:
+                if excluded_nodes and neighbor in excluded_nodes:
+                    continue
+                if excluded_edges and (current_node, neighbor) in excluded_edges:
+                    continue
+                tentative_distance = current_distance + weight
+                if tentative_distance < distances[neighbor]:
+                    distances[neighbor] = tentative_distance
+                    parents[neighbor] = current_node
+                    heuristic = self._heuristic(neighbor, end, accessibility_level)
+                    f_score = tentative_distance + heuristic
+                    heapq.heappush(priority_queue, (f_score, tentative_distance, neighbor))
 
         return float('inf'), []  # No path found
 
-    def _heuristic(self, node, goal):
-        return 0
+    def _bidirectional_shortest_path(self, start, end, accessibility_level):
+        """
+        Bidirectional A* with average potentials: the forward search uses
+        p(v) = (h(v, end) - h(start, v)) / 2 and the backward one -p(v), so both run on
+        the same reduced costs and the search can stop as soon as the two queue tops
+        add up to the best path found through a meeting node.
+        """
+        if start not in self.adjacency_list or end not in self.adjacency_list:
+            return float('inf'), []
+
+        def potential(node):
+            return (self._heuristic(node, end, accessibility_level) -
+                    self._heuristic(start, node, accessibility_level)) / 2.0
+
+        adjacencies = (self._get_level_view(accessibility_level), self._get_reverse_level_view(accessibility_level))
+        signs = (1, -1)
+        distances = ({start: 0}, {end: 0})
+        parents = ({}, {})
+        queues = ([(potential(start), 0, start)], [(-potential(end), 0, end)])  # (key, g, node)
+        best, meeting_node = float('inf'), None
+        self.expanded_nodes = 0
+
+        while queues[0] and queues[1] and queues[0][0][0] + queues[1][0][0] < best:
+            # Expand the side with the smaller queue
+            direction = 0 if len(queues[0]) <= len(queues[1]) else 1
+            _, current_distance, current_node = heapq.heappop(queues[direction])
+            if current_distance > distances[direction][current_node]:
+                continue
+            self.expanded_nodes += 1
+
+            for neighbor, weight in adjacencies[direction][current_node]:
+                tentative_distance = current_distance + weight
+                if tentative_distance < distances[direction].get(neighbor, float('inf')):
+                    distances[direction][neighbor] = tentative_distance
+                    parents[direction][neighbor] = current_node
+                    key = tentative_distance + signs[direction] * potential(neighbor)
+                    heapq.heappush(queues[direction], (key, tentative_distance, neighbor))
+
+                    # Path through the edge, if the other search already reached its far end
+                    other_distance = distances[1 - direction].get(neighbor)
+                    if other_distance is not None and tentative_distance + other_distance < best:
+                        best, meeting_node = tentative_distance + other_distance, neighbor
+
+        if start == end:
+            return 0, [start]
+        if meeting_node is None:
+            return float('inf'), []
+
+        path = [meeting_node]
+        while path[0] != start:
+            path.insert(0, parents[0][path[0]])
+        while path[-1] != end:
+            path.append(parents[1][path[-1]])
+        return best, path
+
+    def _heuristic(self, node, goal, accessibility_level=None):
+        # The larger of the straight-line and the landmark bounds, both admissible
+        bound = 0
+        if self.landmarks is not None and accessibility_level is not None and \
+                not isinstance(accessibility_level, Capabilities):
+            bound = self.landmarks.lower_bound(node, goal, accessibility_level)
+
+        scale = self._get_heuristic_scale()
+        if scale == 0:
+            return bound
+        node_coordinates = self._get_coordinates(node)
+        goal_coordinates = self._get_coordinates(goal)
+        if node_coordinates is None or goal_coordinates is None:
+            return bound
+        return max(bound, scale * math.hypot(goal_coordinates[0] - node_coordinates[0],
+                                             goal_coordinates[1] - node_coordinates[1]))
+
+    def _get_coordinates(self, node):
+        if self.coordinates is None:
+            return None
+        try:
+            return self.coordinates[node]
+        except KeyError:
+            return None
+
+    def _get_heuristic_scale(self):
+        if self._heuristic_scale is None:
+            self._heuristic_scale, _, _ = self.check_coordinates()
+        return self._heuristic_scale
+
+    def check_coordinates(self):
+        """
+        Check the edge weights against the straight-line distances between their nodes.
+        Returns the factor applied to the euclidean distance in the heuristic, the nodes
+        without coordinates and the edges (node1, node2, weight, distance) whose weight
+        is shorter than the straight line. Scaling the distance by the smallest
+        weight/distance ratio over all edges keeps the heuristic admissible and
+        consistent; if any node has no coordinates the heuristic falls back to 0.
+        """
+        if self.coordinates is None:
+            return 0, [], []
+
+        missing = [node for node in self.adjacency_list if self._get_coordinates(node) is None]
+        if missing:
+            return 0, missing, []
+
+        scale = None
+        inconsistent = []
+        for node, neighbors in self.adjacency_list.items():
+            x1, y1 = self._get_coordinates(node)
+            for neighbor, weight, _ in neighbors:
+                x2, y2 = self._get_coordinates(neighbor)
+                distance = math.hypot(x2 - x1, y2 - y1)
+                if distance == 0:
+                    continue
+                if weight < distance:
+                    inconsistent.append((node, neighbor, weight, distance))
+                ratio = max(float(weight), 0.0) / distance
+                if scale is None or ratio < scale:
+                    scale = ratio
+        return scale or 0, missing, inconsistent
 
     def _reconstruct_path(self, parents, start, end):
         path = [end]
@@ -101,28 +831,81 @@ class Graph:
         path.reverse()
         return path
 
-    def draw(self, positions):
-        plt.figure(figsize=(8, 6))
-
-        # Draw edges
+    def draw(self, positions, output=None, labels=True, label_spacing=80, figsize=(8, 6), dpi=100):
+        """
+        Draw the graph with all the edges in one LineCollection and all the nodes in one
+        scatter call. If output is a file name (.png, .svg, ...) the figure is rendered
+        offscreen and saved there, so no display is needed, otherwise it is shown.
+
+        Labels (node names and edge weights) are optional. To keep large maps readable
+        they are culled: at most one label per label_spacing wide, half as tall, box of
+        pixels on the axes.
+        """
+        import numpy as np
+        from matplotlib.collections import LineCollection
+
+        if output is not None:
+            from matplotlib.backends.backend_agg import FigureCanvasAgg
+            from matplotlib.figure import Figure
+            figure = Figure(figsize=figsize, dpi=dpi)
+            FigureCanvasAgg(figure)
+        else:
+            import matplotlib.pyplot as plt
+            figure = plt.figure(figsize=figsize, dpi=dpi)
+        axes = figure.add_subplot(1, 1, 1)
+
+        # Both directions of an undirected edge are drawn as one segment
+        segments, edge_labels, drawn = [], [], set()
         for node, neighbors in self.adjacency_list.items():
+            if node not in positions:
+                continue
             for neighbor, weight, accessibility_weight in neighbors:
-                plt.plot([positions[node][0], positions[neighbor][0]],
-                         [positions[node][1], positions[neighbor][1]], 'k-')
-                plt.text((positions[node][0] + positions[neighbor][0]) / 2,
-                         (positions[node][1] + positions[neighbor][1]) / 2,
-                         str(weight) + ", " + str(accessibility_weight), fontsize=10, color='b')
-
-        # Draw nodes
-        for node, pos in positions.items():
-            plt.plot(pos[0], pos[1], 'ro')
-            plt.text(pos[0], pos[1], str(node), fontsize=12)
-
-        plt.title('Graph Visualization')
-        plt.xlabel('Node')
-        plt.ylabel('Weight')
-        plt.grid(True)
-        plt.show()
+                if neighbor not in positions or (not self.directed and (neighbor, node) in drawn):
+                    continue
+                drawn.add((node, neighbor))
+                segments.append((positions[node], positions[neighbor]))
+                edge_labels.append(str(weight) + ", " + str(accessibility_weight))
+        axes.add_collection(LineCollection(segments, colors='k', linewidths=0.5, zorder=1))
+
+        nodes = [node for node in self.adjacency_list if node in positions]
+        points = np.array([positions[node] for node in nodes], dtype=np.float64).reshape(-1, 2)
+        # Markers shrink as the nodes get denser, down to a pixel
+        box = axes.get_position()
+        axes_pixels = np.array([box.width * figsize[0], box.height * figsize[1]]) * dpi
+        axes.scatter(points[:, 0], points[:, 1], s=max(1.0, min(20.0, axes_pixels.prod() / max(len(points), 1) / 20)),
+                     c='r', linewidths=0, zorder=2)
+
+        if labels and len(points):
+            origin = points.min(axis=0)
+            extent = np.maximum(points.max(axis=0) - origin, 1e-9)
+            cells = np.maximum(axes_pixels / (label_spacing, label_spacing / 2.0), 1)
+            occupied = set()
+
+            def place(x, y, text, **kwargs):
+                cell = (int((x - origin[0]) / extent[0] * cells[0]), int((y - origin[1]) / extent[1] * cells[1]))
+                if cell not in occupied:
+                    occupied.add(cell)
+                    axes.text(x, y, text, **kwargs)
+
+            # Node names first, the edge weights fill the remaining space
+            for node, (x, y) in zip(nodes, points.tolist()):
+                place(x, y, str(node), fontsize=12)
+            for ((x1, y1), (x2, y2)), text in zip(segments, edge_labels):
+                place((x1 + x2) / 2.0, (y1 + y2) / 2.0, text, fontsize=10, color='b')
+
+        axes.autoscale_view()
+        axes.set_aspect('equal', 'datalim')
+        axes.set_title('Graph Visualization')
+        axes.set_xlabel('x')
+        axes.set_ylabel('y')
+        # The grid at zorder 0.5, under the edges (1) and the nodes (2)
+        axes.set_axisbelow(True)
+        axes.grid(True)
+
+        if output is not None:
+            figure.savefig(output)
+        else:
+            plt.show()
 
 
 if __name__ == '__main__':
@@ -140,9 +923,6 @@ if __name__ == '__main__':
     graph.add(b, d, 2, 0)
     graph.add(c, d, 4, 0)
 
-    # Save graph to a file
-    graph.save('../config/graph.txt')
-
     # Find the shortest path between two nodes considering accessibility level
     start = a
     goal = d
@@ -0,0 +1,71 @@
+import math
+
+# Turn-by-turn guidance: the sentences to say before each motion leg of a route, as
+# language keys (see src/config/languages/*.json) with their parameters.
+# Turn thresholds on the change of heading between two legs, in degrees
+STRAIGHT_ANGLE = 20
+SLIGHT_TURN_ANGLE = 60
+TURN_AROUND_ANGLE = 150
+
+
+def _turn_key(previous_theta, theta):
+    # Positive angles turn counterclockwise, to the left of the robot
+    change = math.degrees(math.atan2(math.sin(theta - previous_theta), math.cos(theta - previous_theta)))
+    side = 'left' if change > 0 else 'right'
+    if abs(change) < STRAIGHT_ANGLE:
+        return 'guide_go_straight'
+    if abs(change) < SLIGHT_TURN_ANGLE:
+        return 'guide_slight_' + side
+    if abs(change) < TURN_AROUND_ANGLE:
+        return 'guide_turn_' + side
+    return 'guide_turn_around'
+
+
+def compile_guidance(legs, start, speed=0.3):
+    """
+    Compile the guidance script of a route once, from its motion legs (see waypoints.py)
+    and the (x, y) the robot starts from. Entry i is the (sentence key, parameters) to say
+    before leg i, and the last entry is said on arrival. Parameters are the length of the
+    leg, the distance left after it and the time left at speed (m/s), from prefix sums
+    of the leg lengths, so the motion loop only indexes the script.
+    """
+    points = [start] + [(x, y) for x, y, _ in legs]
+    lengths = [math.hypot(x2 - x1, y2 - y1) for (x1, y1), (x2, y2) in zip(points, points[1:])]
+
+    # Distance covered at the end of each leg
+    covered = []
+    total = 0.0
+    for length in lengths:
+        total += length
+        covered.append(total)
+
+    script = []
+    for i, (_, _, theta) in enumerate(legs):
+        key = 'guide_start' if i == 0 else _turn_key(legs[i - 1][2], theta)
+        remaining = total - covered[i] + lengths[i]
+        script.append((key, {
+            'distance': int(round(lengths[i])),
+            'remaining': int(round(remaining)),
+            'eta': int(5 * round(remaining / speed / 5)),
+        }))
+    script.append(('guide_arrived', {'distance': 0, 'remaining': 0, 'eta': 0}))
+    return script
+
+
+class GuidanceCache:
+    """
+    Compiled scripts of the routes of a session, so switching back to a route (or to
+    a precomputed alternative) does not compile it again.
+    """
+
+    def __init__(self, speed=0.3):
+        self.speed = speed
+        self.scripts = {}
+
+    def get(self, path, legs, start):
+        key = (tuple(path), tuple(start))
+        script = self.scripts.get(key)
+        if script is None:
+            script = compile_guidance(legs, start, self.speed)
+            self.scripts[key] = script
+        return script
@@ -0,0 +1,173 @@
+import os
+import pickle
+
+import numpy as np
+
+from .route_table import file_hash
+
+
+class Landmarks:
+    """
+    ALT heuristic: distances from and to a few landmark nodes for every accessibility
+    level found in a graph. By the triangle inequality, for any landmark L
+
+        d(node, goal) >= d(L, goal) - d(L, node)  and  d(node, goal) >= d(node, L) - d(goal, L)
+
+    which bounds the remaining distance also where there are no coordinates, or where
+    corridors wind far from the straight line.
+    """
+
+    def __init__(self, nodes, levels, landmarks, from_distances, to_distances, graph_hash=None):
+        self.nodes = nodes
+        self.levels = levels
+        self.landmarks = landmarks              # {level: [node]}
+        self.from_distances = from_distances    # {level: n x k array of d(landmark, node)}
+        self.to_distances = to_distances        # {level: n x k array of d(node, landmark)}
+        self.graph_hash = graph_hash
+        self.index = dict((node, i) for i, node in enumerate(nodes))
+
+        # Rows as tuples, faster than NumPy for the few landmarks of a single bound: {level: (from, to)}
+        self._rows = {}
+
+    @classmethod
+    def build(cls, graph, graph_hash=None, count=8):
+        nodes = graph.get_nodes()
+        index = dict((node, i) for i, node in enumerate(nodes))
+        levels = sorted(graph.level_edge_counts())
+
+        landmarks, from_distances, to_distances = {}, {}, {}
+        for level in levels:
+            level_landmarks, from_columns, to_columns = [], [], []
+
+            # Farthest-point selection: each landmark is the node farthest from the ones
+            # chosen so far. Nodes not reachable from any of them come first, so every
+            # component of the level gets a landmark.
+            closest = np.full(len(nodes), np.inf)
+            candidate = 0
+            while nodes and len(level_landmarks) < min(count, len(nodes)):
+                landmark = nodes[candidate]
+                level_landmarks.append(landmark)
+
+                column = cls._distance_column(graph._dijkstra(landmark, level)[0], index)
+                from_columns.append(column)
+                if graph.directed:
+                    to_columns.append(cls._distance_column(graph._dijkstra(landmark, level, reverse=True)[0], index))
+                else:
+                    to_columns.append(column)
+
+                closest = np.minimum(closest, column)
+                closest[[index[node] for node in level_landmarks]] = -1
+                candidate = int(np.argmax(closest))
+                if closest[candidate] < 0:
+                    break
+
+            landmarks[level] = level_landmarks
+            from_distances[level] = np.array(from_columns, dtype=np.float64).T.reshape(len(nodes), -1)
+            to_distances[level] = np.array(to_columns, dtype=np.float64).T.reshape(len(nodes), -1)
+
+        return cls(nodes, levels, landmarks, from_distances, to_distances, graph_hash)
+
+    @staticmethod
+    def _distance_column(distances, index):
+        column = np.full(len(index), np.inf)
+        for node, distance in distances.items():
+            column[index[node]] = distance
+        return column
+
+    def save(self, path):
+        with open(path, 'wb') as file:
+            pickle.dump((self.graph_hash, self.nodes, self.levels, self.landmarks,
+                         self.from_distances, self.to_distances), file, pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as file:
+            graph_hash, nodes, levels, landmarks, from_distances, to_distances = pickle.load(file)
+        return cls(nodes, levels, landmarks, from_distances, to_distances, graph_hash)
+
+    @classmethod
+    def load_or_build(cls, graph, graph_path, cache_path=None, count=8):
+        """
+        Load the landmarks cached for the current content of graph_path, rebuilding
+        and caching them again if the graph file changed.
+        """
+        if cache_path is None:
+            cache_path = os.path.splitext(graph_path)[0] + '.landmarks.pkl'
+        graph_hash = file_hash(graph_path)
+
+        if os.path.exists(cache_path):
+            try:
+                landmarks = cls.load(cache_path)
+                if landmarks.graph_hash == graph_hash:
+                    return landmarks
+            except Exception as e:
+                print("[WARN] Unable to read the landmarks cache " + cache_path + ": " + str(e))
+
+        landmarks = cls.build(graph, graph_hash, count)
+        landmarks.save(cache_path)
+        return landmarks
+
+    def _get_level(self, accessibility_level):
+        # The subgraph of a level is the one of the highest known level below it
+        candidates = [level for level in self.levels if level <= accessibility_level]
+        return candidates[-1] if candidates else None
+
+    def _get_rows(self, level):
+        rows = self._rows.get(level)
+        if rows is None:
+            rows = ([tuple(row) for row in self.from_distances[level].tolist()],
+                    [tuple(row) for row in self.to_distances[level].tolist()])
+            self._rows[level] = rows
+        return rows
+
+    def lower_bound(self, node, goal, accessibility_level):
+        """
+        Lower bound of the distance from node to goal at an accessibility level,
+        0 if either node is unknown.
+        """
+        level = self._get_level(accessibility_level)
+        i, j = self.index.get(node), self.index.get(goal)
+        if level is None or i is None or j is None:
+            return 0
+
+        from_rows, to_rows = self._get_rows(level)
+        bound = 0
+        for from_node, from_goal, to_node, to_goal in zip(from_rows[i], from_rows[j], to_rows[i], to_rows[j]):
+            # Landmarks that do not reach both nodes (or are not reached from both) are skipped:
+            # an infinite bound would break the potentials of the bidirectional search
+            if bound < from_goal - from_node < float('inf'):
+                bound = from_goal - from_node
+            if bound < to_node - to_goal < float('inf'):
+                bound = to_node - to_goal
+        return bound
+
+
+def expansion_report(graph, queries, landmarks):
+    """
+    Average number of nodes expanded by A* over (start, end, accessibility_level) queries
+    with the zero heuristic, the straight-line heuristic (if the graph has coordinates)
+    and the landmarks (together with the straight line, if any).
+    """
+    coordinates, attached = graph.coordinates, graph.landmarks
+
+    def mean_expansions():
+        total = 0
+        for start, end, accessibility_level in queries:
+            graph.shortest_path(start, end, accessibility_level, algorithm='astar')
+            total += graph.expanded_nodes
+        return float(total) / len(queries) if queries else None
+
+    try:
+        report = {}
+        graph.set_coordinates(None)
+        graph.attach_landmarks(None)
+        report['zero'] = mean_expansions()
+        if coordinates is not None:
+            graph.set_coordinates(coordinates)
+            report['coordinates'] = mean_expansions()
+        graph.attach_landmarks(landmarks)
+        report['landmarks'] = mean_expansions()
+    finally:
+        graph.set_coordinates(coordinates)
+        graph.attach_landmarks(attached)
+    return report
@@ -0,0 +1,210 @@
+import json
+import os
+import struct
+
+from . import binary_map
+from .compact_graph import CompactGraph
+from .features import FEATURES
+from .graph import Graph
+from .route_table import file_hash
+
+try:
+    _string_types = basestring
+except NameError:  # Python 3
+    _string_types = str
+
+# Map bundle: the whole map in one JSON file, compiled once into a binary map.
+#
+# {
+#   "directed": false,
+#   "rooms": {
+#     "A": {"x": 0.0, "y": 0.0, "aliases": {"en": "destination1", "it": "destinazione1"}},
+#     ...
+#   },
+#   "edges": [
+#     {"from": "A", "to": "B", "weight": 3, "accessibility_weight": 1, "features": ["stairs"]},
+#     ...
+#   ]
+# }
+#
+# Aliases (the names shown to the users, per language) and edge features are optional.
+# Features are the barriers of a corridor (see features.FEATURES); a corridor without
+# them gets the ones implied by its accessibility weight.
+# In an undirected map each corridor is listed once. The compiled artifact is a binary map
+# (see binary_map.py) whose metadata keeps the checksum of the bundle it was compiled from,
+# so it is rebuilt only when the bundle changes.
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and value == value
+
+
+def read_bundle(path):
+    with open(path, 'r') as file:
+        try:
+            return json.load(file)
+        except ValueError as e:
+            raise ValueError("Malformed map bundle " + path + ": " + str(e))
+
+
+def validate(bundle):
+    """
+    Check a bundle before compiling it. Returns the errors, which make it unusable
+    (unknown rooms, missing coordinates, invalid weights), and the warnings.
+    """
+    errors, warnings = [], []
+    rooms = bundle.get('rooms') if isinstance(bundle, dict) else None
+    edges = bundle.get('edges') if isinstance(bundle, dict) else None
+    if not isinstance(rooms, dict):
+        errors.append("'rooms' must be an object mapping each room name to its room")
+        rooms = {}
+    if not isinstance(edges, list):
+        errors.append("'edges' must be a list")
+        edges = []
+
+    alias_owners = {}  # {(language, alias): room}
+    for name, room in sorted(rooms.items()):
+        if not isinstance(room, dict):
+            errors.append("Room " + name + " must be an object")
+            continue
+        if not _is_number(room.get('x')) or not _is_number(room.get('y')):
+            errors.append("Room " + name + " has no valid coordinates")
+
+        aliases = room.get('aliases', {})
+        if not isinstance(aliases, dict):
+            errors.append("Room " + name + ": 'aliases' must map each language to a name")
+            continue
+        for language, alias in sorted(aliases.items()):
+            if not isinstance(alias, _string_types):
+                errors.append("Room " + name + ": the " + language + " alias must be a string")
+                continue
+            owner = alias_owners.setdefault((language, alias), name)
+            if owner != name:
+                errors.append("Alias '" + alias + "' (" + language + ") names both " + owner + " and " + name)
+
+    connected = set()
+    for i, edge in enumerate(edges):
+        where = "Edge " + str(i + 1)
+        if not isinstance(edge, dict):
+            errors.append(where + " must be an object")
+            continue
+        for key in ('from', 'to'):
+            if not isinstance(edge.get(key), _string_types) or edge[key] not in rooms:
+                errors.append(where + ": unknown room " + repr(edge.get(key)) + " in '" + key + "'")
+            else:
+                connected.add(edge[key])
+        if not _is_number(edge.get('weight')) or edge['weight'] <= 0:
+            errors.append(where + ": the weight must be a positive number")
+        accessibility_weight = edge.get('accessibility_weight')
+        if not isinstance(accessibility_weight, int) or isinstance(accessibility_weight, bool) or accessibility_weight < 0:
+            errors.append(where + ": the accessibility weight must be a non-negative integer")
+        if not isinstance(edge.get('features', []), list):
+            errors.append(where + ": 'features' must be a list")
+        else:
+            for feature in edge.get('features', []):
+                if feature not in FEATURES:
+                    errors.append(where + ": unknown feature " + repr(feature) + ", expected one of " +
+                                  ", ".join(sorted(FEATURES)))
+
+    for name in sorted(set(rooms) - connected):
+        warnings.append("Room " + name + " has no edges and cannot be reached")
+    return errors, warnings
+
+
+def compile_bundle(bundle, source_hash=None):
+    """
+    Validate a bundle and build its CompactGraph, with the aliases and the edge features
+    in the metadata. Raises ValueError listing every error found.
+    """
+    errors, _ = validate(bundle)
+    if errors:
+        raise ValueError("Invalid map bundle:\n" + "\n".join(errors))
+
+    rooms = bundle['rooms']
+    coordinates = dict((str(name), (float(room['x']), float(room['y']))) for name, room in rooms.items())
+    graph = Graph(directed=bool(bundle.get('directed', False)), coordinates=coordinates)
+    features = []
+    for edge in bundle['edges']:
+        graph.add(str(edge['from']), str(edge['to']), edge['weight'], edge['accessibility_weight'])
+        if edge.get('features'):
+            features.append([str(edge['from']), str(edge['to']), sorted(edge['features'])])
+
+    compact_graph = CompactGraph.from_graph(graph)
+    compact_graph.metadata = {
+        'source_hash': source_hash,
+        'directed': graph.directed,
+        'aliases': dict((str(name), room['aliases']) for name, room in rooms.items() if room.get('aliases')),
+        'features': features,
+    }
+    return compact_graph
+
+
+def compile_file(bundle_path, artifact_path=None):
+    """
+    Compile a bundle file into its binary map (by default next to it, with the .pwmap
+    extension). Returns the warnings found while validating it.
+    """
+    if artifact_path is None:
+        artifact_path = os.path.splitext(bundle_path)[0] + '.pwmap'
+    bundle = read_bundle(bundle_path)
+    binary_map.save(compile_bundle(bundle, file_hash(bundle_path)), artifact_path)
+    return validate(bundle)[1]
+
+
+def load_compiled(bundle_path, artifact_path=None):
+    """
+    Load the compiled map of a bundle, compiling it again first if the artifact is
+    missing or was compiled from a different version of the bundle.
+    """
+    if artifact_path is None:
+        artifact_path = os.path.splitext(bundle_path)[0] + '.pwmap'
+    source_hash = file_hash(bundle_path)
+
+    if os.path.exists(artifact_path):
+        try:
+            compact_graph = binary_map.load(artifact_path)
+            if compact_graph.metadata and compact_graph.metadata.get('source_hash') == source_hash:
+                return compact_graph
+        except (ValueError, struct.error) as e:
+            # A stale format or a truncated file, e.g. left by an interrupted copy
+            print("[WARN] Unable to read the compiled map " + artifact_path + ": " + str(e))
+
+    for warning in compile_file(bundle_path, artifact_path):
+        print("[WARN] " + warning)
+    return binary_map.load(artifact_path)
+
+
+def destinations(compact_graph):
+    """
+    [(room, {language: alias})] of the rooms of a compiled map the users can choose, the
+    ones with aliases, sorted by room name.
+    """
+    return sorted((str(name), aliases) for name, aliases in (compact_graph.metadata or {}).get('aliases', {}).items())
+
+
+def text_to_bundle(graph_path, coords_path, bundle_path, aliases=None):
+    """
+    Write the bundle of a map kept in graph.txt and coords.txt. aliases, if given,
+    maps room names to {language: alias}.
+    """
+    graph = Graph.static_load(graph_path)
+    rooms = {}
+    with open(coords_path, 'r') as file:
+        for line in file:
+            if line.strip():
+                name, x, y = line.split()
+                rooms[name] = {'x': float(x), 'y': float(y)}
+    for name, room_aliases in (aliases or {}).items():
+        rooms.setdefault(name, {})['aliases'] = room_aliases
+
+    # Each undirected corridor once; Graph already merged the duplicates
+    edges = []
+    for node in sorted(graph.adjacency_list):
+        for neighbor, weight, accessibility_weight in sorted(graph.adjacency_list[node]):
+            if graph.directed or node <= neighbor:
+                edges.append({'from': node, 'to': neighbor, 'weight': weight,
+                              'accessibility_weight': accessibility_weight})
+
+    with open(bundle_path, 'w') as file:
+        json.dump({'directed': graph.directed, 'rooms': rooms, 'edges': edges}, file, indent=2, sort_keys=True)
+        file.write("\n")
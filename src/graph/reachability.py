@@ -0,0 +1,188 @@
+import bisect
+
+from .features import Capabilities
+
+# Largest condensation whose transitive closure is kept: C components take C^2 bits
+# (2 MB at this size) and O(C^2 / word size) operations to build
+MAX_CLOSURE_COMPONENTS = 4096
+
+
+class ReachabilityIndex:
+    """
+    Which nodes can reach which at every accessibility level found in a graph, so a
+    request with no accessible route is rejected without searching. Each level labels
+    the nodes with their connected component (strongly connected component for directed
+    graphs), which answers undirected queries in O(1). A directed graph also keeps its
+    condensation: with up to MAX_CLOSURE_COMPONENTS components, the bitmask of the
+    components reachable from each one, answering in O(1); above that, where the closure
+    would cost more than the searches it saves, only the condensation edges, and a query
+    searches them in O(C + E) for C components and E condensation edges at worst. The
+    labels of a Capabilities are computed on its first query.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.directed = graph.directed
+        self.levels = sorted(set(accessibility_weight
+                                 for neighbors in graph.adjacency_list.values()
+                                 for _, _, accessibility_weight in neighbors))
+
+        # Per level: (labels {node: component}, closure [bitmask of the reachable components]
+        # or condensation [set of the successor components] for directed graphs, else None)
+        self.tables = [self._label(level) for level in self.levels]
+
+        # Tables of the Capabilities queried so far: {capabilities: (labels, closure)}
+        self.capabilities = {}
+
+    def _label(self, accessibility_level):
+        view = self.graph._get_level_view(accessibility_level)
+        if self.directed:
+            return _strong_components(view)
+        return _components(view), None
+
+    def _get_tables(self, accessibility_level):
+        if isinstance(accessibility_level, Capabilities):
+            tables = self.capabilities.get(accessibility_level)
+            if tables is None:
+                tables = self.capabilities[accessibility_level] = self._label(accessibility_level)
+            return tables
+
+        # A level has the edges of the highest level found in the graph up to it
+        i = bisect.bisect_right(self.levels, accessibility_level) - 1
+        return self.tables[i] if i >= 0 else None
+
+    @staticmethod
+    def _reachable_in(tables, start, end):
+        labels, closure = tables
+        if start not in labels or end not in labels:
+            return False
+        if closure is None:
+            return labels[start] == labels[end]
+        if isinstance(closure, _Condensation):
+            return closure.reaches(labels[start], labels[end])
+        return bool(closure[labels[start]] >> labels[end] & 1)
+
+    def reachable(self, start, end, accessibility_level):
+        """
+        Whether a path from start to end exists at accessibility_level.
+        """
+        if start == end:
+            return True
+        tables = self._get_tables(accessibility_level)
+        return tables is not None and self._reachable_in(tables, start, end)
+
+    def minimum_level(self, start, end):
+        """
+        The lowest accessibility level at which end can be reached from start, or None if
+        it cannot be reached at any level.
+        """
+        if start == end:
+            return self.levels[0] if self.levels else 0
+        for level, tables in zip(self.levels, self.tables):
+            if self._reachable_in(tables, start, end):
+                return level
+        return None
+
+
+def _components(view):
+    labels = {}
+    component = 0
+    for root in view:
+        if root in labels:
+            continue
+        component += 1
+        labels[root] = component
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            for neighbor, _ in view[node]:
+                if neighbor not in labels:
+                    labels[neighbor] = component
+                    stack.append(neighbor)
+    return labels
+
+
+def _strong_components(view):
+    """
+    Tarjan's algorithm, without recursion. Components are numbered as they are closed,
+    which is a reverse topological order of the condensation: the components an edge
+    leads to are numbered before the one it leaves, so a single pass in that order
+    builds the reachable sets.
+    """
+    index = {}
+    low = {}
+    labels = {}
+    stack = []
+    members = []  # Nodes of each component
+    for root in view:
+        if root in index:
+            continue
+        index[root] = low[root] = len(index)
+        stack.append(root)
+        work = [(root, iter(view[root]))]
+        while work:
+            node, neighbors = work[-1]
+            for neighbor, _ in neighbors:
+                if neighbor not in index:
+                    index[neighbor] = low[neighbor] = len(index)
+                    stack.append(neighbor)
+                    work.append((neighbor, iter(view[neighbor])))
+                    break
+                if neighbor not in labels:
+                    low[node] = min(low[node], index[neighbor])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
+                if low[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        labels[member] = len(members)
+                        component.append(member)
+                        if member == node:
+                            break
+                    members.append(component)
+
+    successors = []
+    for component, nodes in enumerate(members):
+        successors.append(set(labels[neighbor] for node in nodes for neighbor, _ in view[node]
+                              if labels[neighbor] != component))
+    if len(members) > MAX_CLOSURE_COMPONENTS:
+        return labels, _Condensation(successors)
+
+    closure = []
+    for component, component_successors in enumerate(successors):
+        reachable = 1 << component
+        for successor in component_successors:
+            reachable |= closure[successor]
+        closure.append(reachable)
+    return labels, closure
+
+
+class _Condensation(object):
+    """
+    Edges between the strongly connected components, searched per query. Components
+    are numbered in reverse topological order, so only the ones numbered above the
+    target can lead to it.
+    """
+
+    def __init__(self, successors):
+        self.successors = successors
+
+    def reaches(self, start, end):
+        if start == end:
+            return True
+        if start < end:
+            return False
+        seen = set([start])
+        stack = [start]
+        while stack:
+            for successor in self.successors[stack.pop()]:
+                if successor == end:
+                    return True
+                if successor > end and successor not in seen:
+                    seen.add(successor)
+                    stack.append(successor)
+        return False
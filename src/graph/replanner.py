@@ -0,0 +1,151 @@
+import heapq
+import itertools
+
+
+class IncrementalPlanner:
+    """
+    D* Lite planner for one active route. The search runs backwards from the goal
+    and keeps its state between calls, so when an edge cost changes or a corridor
+    closes only the nodes whose distance is affected get expanded again.
+    """
+
+    def __init__(self, graph, start, goal, accessibility_level, max_expansions=None, overrides=None):
+        self.graph = graph
+        self.start = start
+        self.goal = goal
+        self.accessibility_level = accessibility_level
+
+        # Upper bound on the nodes expanded by a single replan call
+        self.max_expansions = max_expansions
+        self.expanded_nodes = 0
+
+        # Successors and predecessors on the subgraph usable at this accessibility level
+        self.successors = graph._get_level_view(accessibility_level)
+        self.predecessors = dict((node, []) for node in self.successors)
+        for node, neighbors in self.successors.items():
+            for neighbor, _ in neighbors:
+                self.predecessors[neighbor].append(node)
+
+        # Edge costs that differ from the graph: {(node1, node2): weight}
+        self.overrides = dict(overrides) if overrides else {}
+
+        self.g = {}
+        self.rhs = {goal: 0}
+        self.km = 0
+        self.last = start
+        self.queue = []
+        self.queue_keys = {}
+        self.counter = itertools.count()
+        self._push(goal, self._calculate_key(goal))
+
+    # ------------------------------- Costs ------------------------------ #
+
+    def _cost(self, node1, node2):
+        if (node1, node2) in self.overrides:
+            return self.overrides[(node1, node2)]
+        return min(weight for neighbor, weight in self.successors[node1] if neighbor == node2)
+
+    def update_edge(self, node1, node2, weight):
+        """
+        Change the cost of an edge of the route graph (in both directions if the graph
+        is undirected). A weight of float('inf') closes the edge.
+        """
+        self.overrides[(node1, node2)] = weight
+        self._update_vertex(node1)
+        if not self.graph.directed:
+            self.overrides[(node2, node1)] = weight
+            self._update_vertex(node2)
+
+    def close_edge(self, node1, node2):
+        self.update_edge(node1, node2, float('inf'))
+
+    def reopen_edge(self, node1, node2):
+        self.overrides.pop((node1, node2), None)
+        self._update_vertex(node1)
+        if not self.graph.directed:
+            self.overrides.pop((node2, node1), None)
+            self._update_vertex(node2)
+
+    # ------------------------------ Search ------------------------------ #
+
+    def _get_g(self, node):
+        return self.g.get(node, float('inf'))
+
+    def _get_rhs(self, node):
+        return self.rhs.get(node, float('inf'))
+
+    def _calculate_key(self, node):
+        value = min(self._get_g(node), self._get_rhs(node))
+        return value + self.graph._heuristic(self.start, node, self.accessibility_level) + self.km, value
+
+    def _push(self, node, key):
+        self.queue_keys[node] = key
+        heapq.heappush(self.queue, (key, next(self.counter), node))
+
+    def _top_key(self):
+        # Drop the entries that were removed or superseded since they were pushed
+        while self.queue:
+            key, _, node = self.queue[0]
+            if self.queue_keys.get(node) == key:
+                return key
+            heapq.heappop(self.queue)
+        return float('inf'), float('inf')
+
+    def _update_vertex(self, node):
+        if node != self.goal:
+            self.rhs[node] = min([self._cost(node, neighbor) + self._get_g(neighbor)
+                                  for neighbor, _ in self.successors[node]] or [float('inf')])
+        self.queue_keys.pop(node, None)
+        if self._get_g(node) != self._get_rhs(node):
+            self._push(node, self._calculate_key(node))
+
+    def _compute_shortest_path(self):
+        self.expanded_nodes = 0
+        while (self._top_key() < self._calculate_key(self.start)
+               or self._get_rhs(self.start) != self._get_g(self.start)):
+            if self.max_expansions is not None and self.expanded_nodes >= self.max_expansions:
+                return False
+
+            old_key, _, node = heapq.heappop(self.queue)
+            del self.queue_keys[node]
+            self.expanded_nodes += 1
+
+            new_key = self._calculate_key(node)
+            if old_key < new_key:
+                self._push(node, new_key)
+            elif self._get_g(node) > self._get_rhs(node):
+                self.g[node] = self.rhs[node]
+                for predecessor in self.predecessors[node]:
+                    self._update_vertex(predecessor)
+            else:
+                self.g[node] = float('inf')
+                self._update_vertex(node)
+                for predecessor in self.predecessors[node]:
+                    self._update_vertex(predecessor)
+        return True
+
+    def advance(self, node):
+        """
+        Move the start of the route to the node the robot just reached.
+        """
+        self.km += self.graph._heuristic(self.last, node, self.accessibility_level)
+        self.last = node
+        self.start = node
+
+    def replan(self):
+        """
+        Repair the route from the current start. Returns (distance, path), or None if
+        the expansion budget ran out first: calling it again resumes the search.
+        """
+        if not self._compute_shortest_path():
+            return None
+
+        distance = self._get_g(self.start)
+        if distance == float('inf'):
+            return float('inf'), []
+
+        path = [self.start]
+        while path[-1] != self.goal:
+            path.append(min(self.successors[path[-1]],
+                            key=lambda edge: self._cost(path[-1], edge[0]) + self._get_g(edge[0]))[0])
+        return distance, path
@@ -1,15 +1,23 @@
+import heapq
+import math
+
+import numpy as np
+
+
 class RoomMapper:
     def __init__(self):
         self.rooms = {}
+        self._index = None
 
     def add_room(self, name, x, y):
         self.rooms[name] = (x, y)
+        self._index = None
 
     def __getitem__(self, item):
         return self.rooms[item]
 
     def get_room(self, name):
-        return self.rooms.get(name)        
+        return self.rooms.get(name)
 
     def save(self, filename):
         with open(filename, 'w') as file:
@@ -18,20 +26,106 @@ class RoomMapper:
 
     def load(self, filename):
         self.rooms = {}
+        self._index = None
         with open(filename, 'r') as file:
-            for line in file:
+            for line_number, line in enumerate(file, 1):
                 parts = line.split()
-                if len(parts) == 3:
+                if not parts:
+                    continue
+                try:
                     name, x, y = parts
                     self.add_room(name, float(x), float(y))
+                except ValueError:
+                    raise ValueError("Malformed line " + str(line_number) + " in " + filename + ": " + line.strip())
 
     @classmethod
     def static_load(cls, filename):
-        
+
         rm = RoomMapper()
         rm.load(filename)
         return rm
-    
+
+    # ------------------------------ Spatial index ----------------------------- #
+
+    def _get_index(self):
+        """
+        Uniform grid over the rooms, built on first use: the coordinates in an n x 2 array,
+        for each cell the indices of the rooms inside it, and the last occupied cell on each
+        axis (the first one is always 0).
+        """
+        if self._index is None:
+            names = list(self.rooms.keys())
+            points = np.array([self.rooms[name] for name in names], dtype=np.float64).reshape(-1, 2)
+            origin = points.min(axis=0) if len(points) else np.zeros(2)
+            extent = points.max(axis=0) - origin if len(points) else np.zeros(2)
+
+            # About two rooms per cell
+            area = max(extent[0], 1.0) * max(extent[1], 1.0)
+            cell_size = math.sqrt(2.0 * area / max(len(points), 1))
+
+            cells = {}
+            for i, cell in enumerate(np.floor((points - origin) / cell_size).astype(np.int64).tolist()):
+                cells.setdefault(tuple(cell), []).append(i)
+            cell_keys = np.array(list(cells.keys()), dtype=np.int64).reshape(-1, 2)
+            last_cell = tuple(cell_keys.max(axis=0).tolist()) if len(cell_keys) else (0, 0)
+            self._index = (names, points, origin, cell_size, cells, cell_keys, last_cell)
+        return self._index
+
+    def k_nearest(self, x, y, k=1):
+        """
+        The k rooms closest to (x, y), as (name, distance) pairs sorted by distance.
+        Rings of grid cells are visited outwards until no unvisited cell can be closer
+        than the k-th room found.
+        """
+        names, points, origin, cell_size, cells, cell_keys, (last_x, last_y) = self._get_index()
+        k = min(k, len(names))
+        if k == 0:
+            return []
+
+        cx, cy = int(math.floor((x - origin[0]) / cell_size)), int(math.floor((y - origin[1]) / cell_size))
+
+        # Rings that do not touch the bounding box of the grid are empty
+        ring = max(0, -cx, cx - last_x, -cy, cy - last_y)
+        last_ring = max(abs(cx), abs(cx - last_x), abs(cy), abs(cy - last_y))
+        rings = None  # Ring of every occupied cell, computed if a ring is larger than the grid
+
+        found = []  # Max-heap of (-distance, index) of the k closest rooms seen so far
+        while ring <= last_ring:
+            if ring == 0:
+                ring_cells = [(cx, cy)]
+            elif 8 * ring > len(cells):
+                # Cheaper to pick the occupied cells of the ring than to walk all of them
+                if rings is None:
+                    rings = np.max(np.abs(cell_keys - (cx, cy)), axis=1)
+                ring_cells = [tuple(cell) for cell in cell_keys[rings == ring].tolist()]
+            else:
+                ring_cells = ([(cx + dx, cy - ring) for dx in range(-ring, ring + 1)] +
+                              [(cx + dx, cy + ring) for dx in range(-ring, ring + 1)] +
+                              [(cx - ring, cy + dy) for dy in range(-ring + 1, ring)] +
+                              [(cx + ring, cy + dy) for dy in range(-ring + 1, ring)])
+            indices = [i for cell in ring_cells for i in cells.get(cell, ())]
+            if indices:
+                distances = np.hypot(points[indices, 0] - x, points[indices, 1] - y).tolist()
+                for i, distance in zip(indices, distances):
+                    if len(found) < k:
+                        heapq.heappush(found, (-distance, i))
+                    elif distance < -found[0][0]:
+                        heapq.heapreplace(found, (-distance, i))
+
+            # Every room in a farther ring is at least ring * cell_size away
+            if len(found) == k and -found[0][0] <= ring * cell_size:
+                break
+            ring += 1
+
+        return [(names[i], -distance) for distance, i in sorted(found, reverse=True)]
+
+    def nearest(self, x, y):
+        """
+        The room closest to (x, y) as a (name, distance) pair, or None if there are no rooms.
+        """
+        result = self.k_nearest(x, y, 1)
+        return result[0] if result else None
+
     def __str__(self):
         return "\n".join(str(name) + ": ( " + str(x) + ", " + str(y) + ")" for name, (x, y) in self.rooms.items())
 
@@ -0,0 +1,164 @@
+import hashlib
+import heapq
+import multiprocessing
+import os
+import pickle
+
+import numpy as np
+
+# Adjacency shared with the worker processes: {level: [[(target index, weight), ...], ...]}
+_worker_adjacencies = None
+
+
+def _init_worker(adjacencies):
+    global _worker_adjacencies
+    _worker_adjacencies = adjacencies
+
+
+def _single_source(task):
+    """
+    Dijkstra from one source on the subgraph of one accessibility level.
+    Returns the distance and the first hop towards every node (-1 if unreachable).
+    """
+    level, source = task
+    adjacency = _worker_adjacencies[level]
+    distances = [float('inf')] * len(adjacency)
+    next_hops = [-1] * len(adjacency)
+    distances[source] = 0
+    next_hops[source] = source
+
+    priority_queue = [(0, source)]
+    while priority_queue:
+        current_distance, current_node = heapq.heappop(priority_queue)
+        if current_distance > distances[current_node]:
+            continue
+        for neighbor, weight in adjacency[current_node]:
+            tentative_distance = current_distance + weight
+            if tentative_distance < distances[neighbor]:
+                distances[neighbor] = tentative_distance
+                next_hops[neighbor] = neighbor if current_node == source else next_hops[current_node]
+                heapq.heappush(priority_queue, (tentative_distance, neighbor))
+
+    return level, source, distances, next_hops
+
+
+def file_hash(path):
+    """
+    Content hash of a file, used to key cached artifacts derived from it.
+    """
+    with open(path, 'rb') as file:
+        return hashlib.sha1(file.read()).hexdigest()
+
+
+class RouteTable:
+    """
+    All-pairs distances and next hops for every accessibility level found in a graph.
+    A query walks the next-hop matrix, so it costs O(path length).
+    """
+
+    # The table takes 12 bytes per node pair and level, and a Dijkstra from every node
+    # to build: above this many nodes the searches answer without it
+    MAX_NODES = 1000
+
+    def __init__(self, nodes, levels, distances, next_hops, graph_hash=None):
+        self.nodes = nodes
+        self.levels = levels
+        self.distances = dict((level, np.asarray(distances[level], dtype=np.float64))
+                              for level in levels)    # {level: n x n distances}
+        self.next_hops = dict((level, np.asarray(next_hops[level], dtype=np.int32))
+                              for level in levels)    # {level: n x n node indices, -1 if unreachable}
+        self.graph_hash = graph_hash
+        self.index = dict((node, i) for i, node in enumerate(nodes))
+
+    @classmethod
+    def build(cls, graph, graph_hash=None, processes=None):
+        nodes = graph.get_nodes()
+        index = dict((node, i) for i, node in enumerate(nodes))
+        levels = sorted(graph.level_edge_counts())
+
+        adjacencies = {}
+        for level in levels:
+            view = graph._get_level_view(level)
+            adjacencies[level] = [[(index[neighbor], weight) for neighbor, weight in view[node]]
+                                  for node in nodes]
+
+        tasks = [(level, source) for level in levels for source in range(len(nodes))]
+        if processes == 1:
+            _init_worker(adjacencies)
+            results = [_single_source(task) for task in tasks]
+        else:
+            pool = multiprocessing.Pool(processes, _init_worker, (adjacencies,))
+            try:
+                results = pool.map(_single_source, tasks, chunksize=max(1, len(tasks) // (4 * multiprocessing.cpu_count())))
+            finally:
+                pool.close()
+                pool.join()
+
+        distances = dict((level, np.empty((len(nodes), len(nodes)), dtype=np.float64)) for level in levels)
+        next_hops = dict((level, np.empty((len(nodes), len(nodes)), dtype=np.int32)) for level in levels)
+        for level, source, source_distances, source_next_hops in results:
+            distances[level][source] = source_distances
+            next_hops[level][source] = source_next_hops
+
+        return cls(nodes, levels, distances, next_hops, graph_hash)
+
+    def save(self, path):
+        with open(path, 'wb') as file:
+            pickle.dump((self.graph_hash, self.nodes, self.levels, self.distances, self.next_hops),
+                        file, pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as file:
+            graph_hash, nodes, levels, distances, next_hops = pickle.load(file)
+        return cls(nodes, levels, distances, next_hops, graph_hash)
+
+    @classmethod
+    def load_or_build(cls, graph, graph_path, cache_path=None, processes=None):
+        """
+        Load the table cached for the current content of graph_path, rebuilding
+        and caching it again if the graph file changed.
+        """
+        if cache_path is None:
+            cache_path = os.path.splitext(graph_path)[0] + '.routes.pkl'
+        graph_hash = file_hash(graph_path)
+
+        if os.path.exists(cache_path):
+            try:
+                table = cls.load(cache_path)
+                if table.graph_hash == graph_hash:
+                    return table
+            except Exception as e:
+                print("[WARN] Unable to read the route table cache " + cache_path + ": " + str(e))
+
+        table = cls.build(graph, graph_hash, processes)
+        table.save(cache_path)
+        return table
+
+    def covers(self, start, end):
+        return start in self.index and end in self.index
+
+    def _get_level(self, accessibility_level):
+        # The subgraph of a level is the one of the highest known level below it
+        candidates = [level for level in self.levels if level <= accessibility_level]
+        return candidates[-1] if candidates else None
+
+    def shortest_path(self, start, end, accessibility_level):
+        if start == end:
+            return 0, [start]
+
+        level = self._get_level(accessibility_level)
+        if level is None:
+            return float('inf'), []
+
+        source, target = self.index[start], self.index[end]
+        next_hops = self.next_hops[level]
+        if next_hops[source, target] == -1:
+            return float('inf'), []
+
+        path = [self.nodes[source]]
+        current = source
+        while current != target:
+            current = int(next_hops[current, target])
+            path.append(self.nodes[current])
+        return float(self.distances[level][source, target]), path
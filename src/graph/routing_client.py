@@ -0,0 +1,100 @@
+import json
+import socket
+
+from .room_mapper import RoomMapper
+
+# Client of the routing daemon (see routing_service.py). It only needs the standard library
+# and RoomMapper, so guidance sessions can ask for routes without loading the map.
+
+DEFAULT_SOCKET_PATH = '/tmp/pepper_routing.sock'
+
+
+def _level(accessibility_level):
+    # A Capabilities (see features.py) travels as the names of the barriers it can pass
+    if isinstance(accessibility_level, int):
+        return accessibility_level
+    return list(accessibility_level.names)
+
+
+class RoutingClient(object):
+    """
+    Thin client of the routing daemon. Every call raises socket.error (IOError) if the
+    daemon is down, so callers can fall back to planning in process.
+    """
+
+    def __init__(self, socket_path=DEFAULT_SOCKET_PATH, timeout=5.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._socket = None
+        self._file = None
+
+    def _connect(self):
+        if self._socket is None:
+            connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            connection.settimeout(self.timeout)
+            try:
+                connection.connect(self.socket_path)
+            except socket.error:
+                connection.close()
+                raise
+            self._socket = connection
+            self._file = connection.makefile('rb')
+
+    def _request(self, request):
+        self._connect()
+        try:
+            self._socket.sendall((json.dumps(request) + "\n").encode('utf-8'))
+            line = self._file.readline()
+        except socket.error:
+            self.close()
+            raise
+        if not line:
+            self.close()
+            raise socket.error("The routing daemon closed the connection")
+
+        response = json.loads(line.decode('utf-8'))
+        if 'error' in response:
+            raise ValueError(response['error'])
+        return response
+
+    def available(self):
+        try:
+            self._request({'op': 'ping'})
+            return True
+        except (socket.error, ValueError):
+            return False
+
+    def room_mapper(self):
+        room_mapper = RoomMapper()
+        for name, (x, y) in self._request({'op': 'rooms'})['rooms'].items():
+            room_mapper.add_room(str(name), x, y)
+        return room_mapper
+
+    def shortest_path(self, start, end, accessibility_level, closed_edges=None):
+        response = self._request({'op': 'route', 'start': start, 'end': end, 'level': _level(accessibility_level),
+                                  'closed_edges': [list(edge) for edge in closed_edges or []]})
+        return response['distance'], [str(node) for node in response['path']]
+
+    def minimum_level(self, start, end):
+        return self._request({'op': 'minimum_level', 'start': start, 'end': end})['level']
+
+    def k_shortest_paths(self, start, end, accessibility_level, k):
+        response = self._request({'op': 'alternatives', 'start': start, 'end': end,
+                                  'level': _level(accessibility_level), 'k': k})
+        return [(distance, [str(node) for node in path]) for distance, path in response['routes']]
+
+    def close_corridor(self, node1, node2):
+        return self._request({'op': 'close_corridor', 'node1': node1, 'node2': node2})['version']
+
+    def reopen_corridor(self, node1, node2):
+        return self._request({'op': 'reopen_corridor', 'node1': node1, 'node2': node2})['version']
+
+    def record_leg(self, nodes, duration):
+        return self._request({'op': 'record', 'nodes': list(nodes), 'duration': duration})['version']
+
+    def close(self):
+        if self._socket is not None:
+            self._file.close()
+            self._socket.close()
+        self._socket = None
+        self._file = None
@@ -0,0 +1,120 @@
+import threading
+
+
+class RoutingEngine(object):
+    """
+    Routing front end shared by several clients (robots, tablets) while operators close
+    and reopen corridors. Queries run against an immutable snapshot of the graph: an edit
+    is applied to a copy, which then replaces the current snapshot in a single assignment.
+    A query keeps the snapshot it started with, so it never sees a half-applied edit.
+
+    Queries run on the calling thread, and any number of threads may query at once (the
+    routing daemon serves each client on its own thread). The searches are pure Python
+    and hold the interpreter lock, though, so concurrent queries are interleaved rather
+    than run in parallel: the throughput is the one of a single core.
+
+    The graph passed in belongs to the engine from then on and must not be changed directly.
+    """
+
+    def __init__(self, graph):
+        self._prepare(graph)
+
+        # (version, graph), replaced as a whole by the writers
+        self._snapshot = (0, graph)
+        # Reentrant, so a writer can check the snapshot and edit it under the same lock
+        self._write_lock = threading.RLock()
+
+        # Entries removed by close_corridor: {corridor: [(weight, accessibility_weight)]},
+        # keyed as in _corridor
+        self._closed = {}
+
+    @staticmethod
+    def _prepare(graph):
+        # Build the lazy caches before publishing, so readers do not race to fill them
+        graph._get_heuristic_scale()
+        graph._get_reachability()
+        for level in graph.level_edge_counts():
+            graph._get_reverse_level_view(level)
+
+    # ------------------------------ Snapshots ----------------------------- #
+
+    def snapshot(self):
+        """
+        The current (version, graph). The graph must be treated as read-only.
+        """
+        return self._snapshot
+
+    @property
+    def version(self):
+        return self._snapshot[0]
+
+    def edit(self, function):
+        """
+        Apply function to a copy of the current graph and publish the copy as the new
+        snapshot. Edits are serialized; queries keep running on the previous snapshot
+        meanwhile. Returns what function returns.
+        """
+        with self._write_lock:
+            version, graph = self._snapshot
+            new_graph = graph.copy()
+            result = function(new_graph)
+            self._prepare(new_graph)
+            self._snapshot = (version + 1, new_graph)
+            return result
+
+    @staticmethod
+    def _corridor(graph, node1, node2):
+        # An undirected corridor is the same whichever end it is named from
+        if graph.directed or node1 <= node2:
+            return node1, node2
+        return node2, node1
+
+    def close_corridor(self, node1, node2):
+        """
+        Remove the edge between two nodes until reopen_corridor is called. Raises
+        ValueError, without publishing a snapshot, if there is no such open edge.
+        """
+        with self._write_lock:
+            _, graph = self._snapshot
+            corridor = self._corridor(graph, node1, node2)
+            if corridor in self._closed:
+                raise ValueError("The corridor " + str(node1) + " - " + str(node2) + " is already closed")
+            if not any(neighbor == corridor[1] for neighbor, _, _ in graph.adjacency_list.get(corridor[0], [])):
+                raise ValueError("No corridor between " + str(node1) + " and " + str(node2))
+
+            def close(new_graph):
+                self._closed[corridor] = new_graph.remove(*corridor)
+            self.edit(close)
+
+    def reopen_corridor(self, node1, node2):
+        """
+        Restore an edge removed by close_corridor. Raises ValueError, without publishing
+        a snapshot, if the corridor is not closed.
+        """
+        with self._write_lock:
+            _, graph = self._snapshot
+            corridor = self._corridor(graph, node1, node2)
+            if corridor not in self._closed:
+                raise ValueError("The corridor " + str(node1) + " - " + str(node2) + " is not closed")
+
+            def reopen(new_graph):
+                for weight, accessibility_weight in self._closed.pop(corridor):
+                    new_graph.add(corridor[0], corridor[1], weight, accessibility_weight)
+            self.edit(reopen)
+
+    def closed_corridors(self):
+        return list(self._closed.keys())
+
+    # ------------------------------- Queries ------------------------------ #
+
+    def shortest_path(self, start, end, accessibility_level, algorithm=None):
+        _, graph = self._snapshot
+        return graph.shortest_path(start, end, accessibility_level, algorithm)
+
+    def shortest_paths(self, queries):
+        """
+        Answer a list of (start, end, accessibility_level) queries, all against the
+        snapshot current when the call starts.
+        """
+        _, graph = self._snapshot
+        return [graph.shortest_path(start, end, accessibility_level) for start, end, accessibility_level in queries]
@@ -0,0 +1,132 @@
+import json
+import os
+
+try:
+    import socketserver
+except ImportError:  # Python 2
+    import SocketServer as socketserver
+
+from . import binary_map
+from . import map_bundle
+from .features import parse_level
+from .graph import Graph
+from .room_mapper import RoomMapper
+from .routing_client import DEFAULT_SOCKET_PATH
+
+# Local routing daemon: keeps the graph, the coordinates and the route caches in memory and
+# answers over a Unix socket, so a guidance session does not load and plan from scratch.
+#
+# Protocol: one JSON object per line in each direction. Requests have an 'op' field:
+#   ping                                          -> {'version': snapshot version}
+#   rooms                                         -> {'rooms': {name: [x, y]}}
+#   route        start, end, level, closed_edges  -> {'distance': d, 'path': [...]}
+#   alternatives start, end, level, k             -> {'routes': [[d, [...]], ...]}
+#   close_corridor / reopen_corridor node1, node2 -> {'version': new snapshot version}
+#                (an error, with no new version, for a missing, already closed or not closed corridor)
+#   record       nodes, duration                  -> {'version': new snapshot version}
+#                (duration in seconds of a motion leg through nodes, to learn the edge weights)
+# A failed request gets {'error': message}.
+
+
+def load_map(map_path='src/config/map.json', graph_path=None, coords_path=None):
+    """
+    Load the graph and the room coordinates from a map bundle (.json, compiled on the
+    first load) or a binary map, or from map files in the text format if graph_path is
+    given. Returns (graph, room_mapper, path of the file the map was read from).
+    """
+    if graph_path is None:
+        # The binary map is memory-mapped and read without parsing; the searches run on the
+        # mutable Graph built from it, which each process keeps for itself
+        if map_path.endswith('.json'):
+            compact_graph = map_bundle.load_compiled(map_path)
+        else:
+            compact_graph = binary_map.load(map_path)
+        directed = bool((compact_graph.metadata or {}).get('directed', False))
+        room_mapper = compact_graph.to_room_mapper()
+        return compact_graph.to_graph(directed=directed, coordinates=room_mapper), room_mapper, map_path
+
+    room_mapper = RoomMapper.static_load(coords_path) if coords_path is not None else RoomMapper()
+    return Graph.static_load(graph_path, coordinates=room_mapper), room_mapper, graph_path
+
+
+def handle_request(engine, room_mapper, request, learner=None, weights_path=None):
+    operation = request.get('op')
+    if operation == 'ping':
+        return {'version': engine.version}
+    if operation == 'rooms':
+        return {'rooms': room_mapper.rooms}
+    if operation == 'route':
+        closed_edges = set(tuple(edge) for edge in request.get('closed_edges') or [])
+        level = parse_level(request['level'])
+        if not closed_edges:
+            distance, path = engine.shortest_path(request['start'], request['end'], level)
+        else:
+            _, graph = engine.snapshot()
+            if not graph.directed:
+                closed_edges.update([(node2, node1) for node1, node2 in closed_edges])
+            distance, path = graph._astar_shortest_path(request['start'], request['end'], level,
+                                                        excluded_edges=closed_edges)
+        return {'distance': distance, 'path': path}
+    if operation == 'minimum_level':
+        _, graph = engine.snapshot()
+        return {'level': graph.minimum_level(request['start'], request['end'])}
+    if operation == 'alternatives':
+        _, graph = engine.snapshot()
+        return {'routes': graph.k_shortest_paths(request['start'], request['end'], parse_level(request['level']),
+                                                 request['k'])}
+    if operation == 'close_corridor':
+        engine.close_corridor(request['node1'], request['node2'])
+        return {'version': engine.version}
+    if operation == 'reopen_corridor':
+        engine.reopen_corridor(request['node1'], request['node2'])
+        return {'version': engine.version}
+    if operation == 'record':
+        if learner is None:
+            raise ValueError("The routing daemon does not learn edge weights")
+        learner.record_leg(request['nodes'], request['duration'], room_mapper)
+        if weights_path is not None:
+            learner.save(weights_path)
+        # New weights are published as a new snapshot, queries are not blocked meanwhile.
+        # Until a weight changes, the snapshot keeps its route table, landmarks and trees.
+        _, graph = engine.snapshot()
+        if learner.changed_weights(graph):
+            engine.edit(learner.apply)
+        return {'version': engine.version}
+    raise ValueError("Unknown operation: " + str(operation))
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        for line in iter(self.rfile.readline, b''):
+            try:
+                response = handle_request(self.server.engine, self.server.room_mapper, json.loads(line.decode('utf-8')),
+                                          self.server.learner, self.server.weights_path)
+            except (KeyError, ValueError, TypeError) as e:
+                response = {'error': str(e)}
+            self.wfile.write((json.dumps(response) + "\n").encode('utf-8'))
+            self.wfile.flush()
+
+
+class RoutingServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Serves a RoutingEngine on a Unix socket, one thread per connected client.
+    """
+    daemon_threads = True
+
+    def __init__(self, engine, room_mapper, socket_path=DEFAULT_SOCKET_PATH, learner=None, weights_path=None):
+        self.engine = engine
+        self.room_mapper = room_mapper
+        self.learner = learner
+        self.weights_path = weights_path
+        self.socket_path = socket_path
+
+        # A socket file left by a daemon that did not shut down cleanly
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        socketserver.UnixStreamServer.__init__(self, socket_path, _RequestHandler)
+
+    def server_close(self):
+        socketserver.UnixStreamServer.server_close(self)
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
@@ -0,0 +1,110 @@
+import math
+import random
+
+from .graph import Graph
+from .room_mapper import RoomMapper
+
+# Synthetic buildings for benchmarks. Every generator returns a Graph and the RoomMapper
+# with the coordinates of its rooms. Edge weights are never shorter than the straight
+# line between the rooms, and accessibility weights are drawn at random:
+# 0 (accessible) most of the time, up to max_accessibility_weight otherwise.
+
+
+def _accessibility_weight(rng, max_accessibility_weight, barrier_probability):
+    if rng.random() < barrier_probability:
+        return rng.randint(1, max_accessibility_weight)
+    return 0
+
+
+def grid(rows, cols, seed=0, max_accessibility_weight=2, barrier_probability=0.2, prefix=''):
+    """
+    Rooms on a rows x cols grid, each connected to its right and lower neighbor.
+    """
+    rng = random.Random(seed)
+    graph = Graph()
+    room_mapper = RoomMapper()
+    for i in range(rows):
+        for j in range(cols):
+            room_mapper.add_room(prefix + str(i) + '_' + str(j), float(j), float(i))
+
+    for i in range(rows):
+        for j in range(cols):
+            for di, dj in ((0, 1), (1, 0)):
+                if i + di < rows and j + dj < cols:
+                    graph.add(prefix + str(i) + '_' + str(j), prefix + str(i + di) + '_' + str(j + dj),
+                              rng.randint(1, 3),
+                              _accessibility_weight(rng, max_accessibility_weight, barrier_probability))
+    return graph, room_mapper
+
+
+def corridor_tree(nodes, seed=0, branching=3, max_accessibility_weight=2, barrier_probability=0.2):
+    """
+    Tree of corridors: every room hangs off a random earlier room, placed at a random
+    angle from it.
+    """
+    rng = random.Random(seed)
+    graph = Graph()
+    room_mapper = RoomMapper()
+    room_mapper.add_room('R0', 0.0, 0.0)
+    children = {0: 0}
+
+    for i in range(1, nodes):
+        parent = rng.randrange(i)
+        while children.get(parent, 0) >= branching:
+            parent = rng.randrange(i)
+        children[parent] = children.get(parent, 0) + 1
+
+        px, py = room_mapper['R' + str(parent)]
+        length = rng.uniform(1, 5)
+        angle = rng.uniform(0, 2 * math.pi)
+        room_mapper.add_room('R' + str(i), px + length * math.cos(angle), py + length * math.sin(angle))
+        graph.add('R' + str(parent), 'R' + str(i), int(math.ceil(length)),
+                  _accessibility_weight(rng, max_accessibility_weight, barrier_probability))
+    return graph, room_mapper
+
+
+def multi_floor(floors, rows, cols, seed=0, elevators=1, stairs=2,
+                max_accessibility_weight=2, barrier_probability=0.2):
+    """
+    Stacked grid floors connected by elevators (accessibility weight 0) and stairs
+    (accessibility weight 1) at random positions. Rooms are named F<floor>_<row>_<col>.
+    """
+    rng = random.Random(seed)
+    graph = Graph()
+    room_mapper = RoomMapper()
+    for floor in range(floors):
+        floor_graph, floor_rooms = grid(rows, cols, rng.random(), max_accessibility_weight,
+                                        barrier_probability, 'F' + str(floor) + '_')
+        for node, neighbors in floor_graph.adjacency_list.items():
+            for neighbor, weight, accessibility_weight in neighbors:
+                if node < neighbor:
+                    graph.add(node, neighbor, weight, accessibility_weight)
+        for name, (x, y) in floor_rooms.rooms.items():
+            room_mapper.add_room(name, x, y)
+
+    for floor in range(floors - 1):
+        for portal in range(elevators + stairs):
+            i, j = rng.randrange(rows), rng.randrange(cols)
+            lower = 'F' + str(floor) + '_' + str(i) + '_' + str(j)
+            upper = 'F' + str(floor + 1) + '_' + str(i) + '_' + str(j)
+            if portal < elevators:
+                graph.add(lower, upper, 5, 0)
+            else:
+                graph.add(lower, upper, 2, 1)
+    return graph, room_mapper
+
+
+def generate(kind, nodes, seed=0):
+    """
+    Building of the given kind ('grid', 'tree' or 'floors') with about the given number of rooms.
+    """
+    if kind == 'grid':
+        side = max(1, int(round(math.sqrt(nodes))))
+        return grid(side, side, seed)
+    if kind == 'tree':
+        return corridor_tree(nodes, seed)
+    if kind == 'floors':
+        floors = max(1, min(10, nodes // 100))
+        side = max(1, int(round(math.sqrt(nodes / float(floors)))))
+        return multi_floor(floors, side, side, seed)
+    raise ValueError("Unknown building kind: " + kind)
@@ -0,0 +1,59 @@
+import math
+
+
+def _distance_to_segment(point, segment_start, segment_end):
+    px, py = point
+    x1, y1 = segment_start
+    x2, y2 = segment_end
+    dx, dy = x2 - x1, y2 - y1
+    length_squared = dx * dx + dy * dy
+    if length_squared == 0:
+        return math.hypot(px - x1, py - y1)
+    t = max(0.0, min(1.0, ((px - x1) * dx + (py - y1) * dy) / length_squared))
+    return math.hypot(px - (x1 + t * dx), py - (y1 + t * dy))
+
+
+def nearest_segment(point, segments):
+    """
+    Index of the (start, end) segment closest to point, the first one on ties.
+    """
+    return min(range(len(segments)), key=lambda i: _distance_to_segment(point, segments[i][0], segments[i][1]))
+
+
+def compile_legs(path, room_mapper, start=None, tolerance=0.1):
+    """
+    Turn a path into the motion legs to drive, once per route. Intermediate nodes
+    lying within tolerance (meters) of the straight line between the nodes around
+    them are merged, so the robot does not stop and turn at each of them.
+
+    Returns the legs as (x, y, theta) tuples, theta being the heading of the leg
+    from the previous waypoint (start, if given, is the current (x, y) of the robot),
+    and for each leg the index in path of the node it reaches.
+    """
+    points = [room_mapper[node] for node in path]
+    if not points:
+        return [], []
+
+    # Without a start position the robot is assumed to be at the first node already
+    if start is not None:
+        anchor, anchor_index = start, -1
+    else:
+        anchor, anchor_index = points[0], 0
+    legs, leg_nodes = [], []
+
+    while anchor_index < len(points) - 1:
+        # Extend the leg as long as every skipped node stays close to the straight line
+        end_index = anchor_index + 1
+        for candidate in range(anchor_index + 2, len(points)):
+            if all(_distance_to_segment(points[i], anchor, points[candidate]) <= tolerance
+                   for i in range(anchor_index + 1, candidate)):
+                end_index = candidate
+            else:
+                break
+
+        x, y = points[end_index]
+        legs.append((x, y, math.atan2(y - anchor[1], x - anchor[0])))
+        leg_nodes.append(end_index)
+        anchor, anchor_index = points[end_index], end_index
+
+    return legs, leg_nodes
@@ -3,15 +3,22 @@ import argparse
 import sys
 import time
 import random
-import math
 import json
 import os
+import socket
 
 from automaton.automaton import State, TimeoutState, FiniteStateAutomaton
 from utils.limits import joint_limits
 from utils.postures import default_posture, left_arm_raised, right_arm_raised
-from graph.graph import Node, Graph
-from graph.room_mapper import RoomMapper
+from graph.route_table import RouteTable
+from graph.landmarks import Landmarks
+from graph.edge_learning import EdgeWeightLearner
+from graph.replanner import IncrementalPlanner
+from graph.routing_client import DEFAULT_SOCKET_PATH, RoutingClient
+from graph.routing_service import load_map
+from graph.waypoints import compile_legs, nearest_segment
+from graph.guidance import GuidanceCache
+from graph.features import FEATURES, parse_level
 
 # --------------------------------- Services --------------------------------- #
 
@@ -26,6 +33,7 @@ global na_service  # Navigation
 
 # ------------------------- User specific parameters ------------------------- #
 global alevel       # Disablity level
+global route_level  # Accessibility level or Capabilities the routes are planned for
 global wtime        # Time to wait before asking if we need to cancel the procedure
 global lang         # Language
 
@@ -45,17 +53,36 @@ global automaton
 global touch_subscriber  #, word_subscriber
 
 # Current and target position
-global coords
+global planner
+global alternatives
+global path
+global graph
+global map_path
+global routing_client
+global learner, weights_path
+global room_mapper
+global legs, leg_nodes, route_start, route_from_node
+global guidance, guidance_cache, voice_guidance
 global current_pos
 global current_target
+global target_room
 global current_x, current_y
 global at_goal
-global node_index
+global leg_index
+global off_route
+global repairing
 at_goal = False
-node_index = 0
+leg_index = 0
+off_route = False
+repairing = False
 current_x = 0
 current_y = 0
 
+# Nodes the route repair may expand per tick of the moving state, and the pause between
+# two ticks: the robot stands still and keeps reacting to the hand meanwhile
+REPAIR_BUDGET = 1000
+REPAIR_TICK = 0.05
+
 
 # ---------------------------------- States ---------------------------------- #
 
@@ -106,30 +133,69 @@ class MovingState(State):
         # Behavior
         global current_x, current_y
         global at_goal
-        global node_index
+        global leg_index
+        if off_route and not replan_from_pose():
+            self.automaton.change_state('quit_state')
+            return
+
         while not at_goal:
+            if repairing:
+                # A blocked corridor is being routed around, one expansion budget per tick
+                repaired = continue_repair()
+                if off_route:
+                    return
+                if repaired is None:
+                    time.sleep(REPAIR_TICK)
+                    continue
+                if not repaired:
+                    self.automaton.change_state('quit_state')
+                    return
+
             print('[INFO] At goal status: {}'.format(at_goal))
-            print('[INFO] Node index: {}'.format(node_index))
-            print('[INFO] Current target: {}'.format(coords[node_index]))
-            current_target_x, current_target_y = coords[node_index]
-            theta = math.atan2(current_target_y - current_y, current_target_x - current_x)
+            print('[INFO] Leg index: {}'.format(leg_index))
+            current_target_x, current_target_y, theta = legs[leg_index]
+            print('[INFO] Current target: {}'.format(path[leg_nodes[leg_index]]))
             print('[INFO] Current theta: {}'.format(theta))
             print('[INFO] Moving to: ' + str(current_target_x) + ', ' + str(current_target_y))
+            if voice_guidance:
+                animated_say(*guidance[leg_index])
+            started = time.time()
             success = move_to(current_target_x, current_target_y, theta)
-            print('[INFO] Success state for {}: {}'.format(node_index, success))
+            print('[INFO] Success state for {}: {}'.format(leg_index, success))
+            if off_route:
+                # The hand was released and stop_motion cut the leg short: its duration is not
+                # a traversal time, and the route is repaired from the pose on the next entry
+                print('[INFO] Leg {} interrupted'.format(leg_index))
+                return
             if success:
-                node_index += 1
-            if node_index == len(coords):
+                # The first leg of a route planned from an off-node pose is not a traversal
+                if leg_index > 0 or route_from_node:
+                    leg = path[leg_nodes[leg_index - 1] if leg_index > 0 else 0:leg_nodes[leg_index] + 1]
+                    if len(leg) > 1:
+                        record_leg_duration(leg, time.time() - started)
+                if planner is not None:
+                    planner.advance(path[leg_nodes[leg_index]])
+                leg_index += 1
+            else:
+                # A leg may span several corridors: close the one where the robot stopped
+                edge = blocked_edge()
+                if edge is not None:
+                    replan_without_edge(*edge)
+            if leg_index == len(legs):
                 print('[INFO] Success in exit if')
                 at_goal = True
+                if voice_guidance:
+                    animated_say(*guidance[-1])
 
         print('[INFO] Success Exited from while loop')
 
 
     def on_event(self, event):
+        global off_route
         super(MovingState, self).on_event(event)
         if event == 'hand_released':
             stop_motion()
+            off_route = True
             self.automaton.change_state('ask_state')
 
 
@@ -146,6 +212,10 @@ class QuitState(State):
         perform_movement(joint_values=default_posture)
         print('[INFO] Resetting posture')
 
+        if learner is not None:
+            learner.save(weights_path)
+            print('[INFO] Saved the learned edge weights to ' + weights_path)
+
         # Unsubscribe from signals
         # global touch_subscriber, word_subscriber, sr_service
         # sr_service.unsubscribe("pepper_walking_assistant_ASR")
@@ -208,14 +278,17 @@ class AskState(TimeoutState):
 
 # ------------------------------ Utility methods ----------------------------- #
 
-def animated_say(sentence_key):
+def animated_say(sentence_key, parameters=None):
     """
     Say something while contextually moving the head as you speak.
     The sentence_key and lang identify a sentence in a particular language. 
+    The parameters, if any, fill the {placeholders} of the sentence.
     """
     global as_service, lang
     configuration = {"bodyLanguageMode": "contextual"}
     sentence = lang.get(sentence_key, "[Missing translation for " + sentence_key + "]")
+    if parameters:
+        sentence = sentence.format(**parameters)
     as_service.say(sentence, configuration)
 
 
@@ -316,6 +389,172 @@ def stop_motion():
     except Exception as e:
         print("[ERROR] Failed to stop motion: {}".format(e))
 
+def set_route(new_path, from_node=False):
+    """
+    Make new_path the active route, starting from the current position: compile its
+    motion legs and its guidance script once for the whole route. from_node tells
+    whether the robot stands at the first node of the route rather than at an off-node
+    pose, so that its first leg is a traversal of the corridors it spans.
+    """
+    global path, legs, leg_nodes, leg_index, guidance, route_start, route_from_node
+    path = new_path
+    route_from_node = from_node
+    start = route_start = (current_x, current_y)
+    legs, leg_nodes = compile_legs(path, room_mapper, start=start)
+    guidance = guidance_cache.get(path, legs, start)
+    leg_index = 0
+
+def blocked_edge():
+    """
+    The corridor of the current leg where the robot stopped, the one closest to its
+    pose, as (node1, node2). None if it stopped before the first node of the route.
+    """
+    stop_motion()
+    first = leg_nodes[leg_index - 1] if leg_index > 0 else 0
+    edges = [(path[i], path[i + 1]) for i in range(first, leg_nodes[leg_index])]
+    segments = [(room_mapper[node1], room_mapper[node2]) for node1, node2 in edges]
+    if leg_index == 0:
+        # The first leg starts with the way from the pose of the robot to the first node
+        segments.append((route_start, room_mapper[path[0]]))
+    i = nearest_segment((current_x, current_y), segments)
+    return edges[i] if i < len(edges) else None
+
+def new_planner(graph, start, overrides=None):
+    """
+    An IncrementalPlanner for the route from start to the target room. Its backward
+    search is solved here, before the robot moves, so a corridor closing later only
+    repairs it, REPAIR_BUDGET nodes per call.
+    """
+    planner = IncrementalPlanner(graph, start, target_room, route_level, overrides=overrides)
+    planner.replan()
+    planner.max_expansions = REPAIR_BUDGET
+    return planner
+
+def replan_without_edge(node1, node2):
+    """
+    Close the edge between node1 and node2 in the active route. A precomputed alternative
+    through node1 that avoids every closed edge becomes the route at once; otherwise the
+    robot announces it is looking for another way and the moving state repairs the route
+    on its next ticks (see continue_repair).
+    """
+    global planner, repairing
+    print('[INFO] Closing edge: ' + str(node1) + ' -> ' + str(node2))
+    if planner is None:
+        # The daemon planned the route: the search starts now, within the budget of each tick
+        planner = IncrementalPlanner(get_graph(), node1, target_room, route_level, max_expansions=REPAIR_BUDGET)
+    elif planner.start != node1:
+        # The robot went past the nodes of the leg before node1
+        planner.advance(node1)
+    planner.close_edge(node1, node2)
+    closed_edges = set(edge for edge, weight in planner.overrides.items() if weight == float('inf'))
+
+    for _, alternative in alternatives:
+        if node1 in alternative:
+            suffix = alternative[alternative.index(node1):]
+            if not any(edge in closed_edges for edge in zip(suffix, suffix[1:])):
+                print('[INFO] Switching to a precomputed alternative route')
+                set_route(suffix)
+                print('[INFO] New path           : ' + str(path))
+                return
+
+    repairing = True
+    animated_say('guide_replanning')
+
+def continue_repair():
+    """
+    One expansion budget of the route repair. Returns None if the search needs more
+    budget, True once the repaired route is set, False if the target room can no longer
+    be reached.
+    """
+    global repairing
+    result = planner.replan()
+    if result is None:
+        return None
+
+    repairing = False
+    distance, new_path = result
+    if not new_path:
+        print('[ERROR] No path left to the target room')
+        return False
+
+    set_route(new_path)
+    print('[INFO] New path           : ' + str(path))
+    return True
+
+def replan_from_pose(candidates=3):
+    """
+    Start a new route from the actual position of the robot, which after stop_motion()
+    is usually between two nodes. Among the closest rooms from which the target is
+    reachable, pick the one minimizing the straight line to it plus the route from it.
+    Returns False if the target cannot be reached from any of them.
+    """
+    global planner, off_route, repairing
+    current_graph = get_graph()
+
+    # The closest rooms from which the target is reachable, widening the search while
+    # fewer than candidates of the ones found are
+    count = candidates
+    while True:
+        nearest = room_mapper.k_nearest(current_x, current_y, count)
+        reachable = [(node, snap_distance) for node, snap_distance in nearest
+                     if node in current_graph.adjacency_list and
+                     current_graph.reachable(node, target_room, route_level)]
+        if len(reachable) >= candidates or len(nearest) < count:
+            break
+        count *= 2
+    reachable = reachable[:candidates]
+
+    # One backward search from the target room, avoiding the corridors closed so far,
+    # gives the route length from every candidate
+    closed_edges = set(edge for edge, weight in planner.overrides.items()
+                       if weight == float('inf')) if planner is not None else set()
+    distances, parents = current_graph._dijkstra(target_room, route_level, targets=[node for node, _ in reachable],
+                                                 reverse=True, excluded_edges=closed_edges)
+    routes = [(snap_distance + distances[node], node) for node, snap_distance in reachable if node in distances]
+    if not routes:
+        print('[ERROR] The target room is not reachable from the current position')
+        return False
+
+    new_path = [min(routes)[1]]
+    while new_path[-1] != target_room:
+        new_path.append(parents[new_path[-1]])
+    if planner is not None:
+        # The backward search of the planner stays valid, only its start moves
+        planner.advance(new_path[0])
+
+    set_route(new_path)
+    off_route = False
+    repairing = False
+    print('[INFO] Route from the current position: ' + str(path))
+    return True
+
+def record_leg_duration(nodes, duration):
+    """
+    Feed the time taken by a motion leg to the edge weight learning, in the routing
+    daemon if there is one.
+    """
+    print('[INFO] Leg ' + ' -> '.join(str(node) for node in nodes) + ' took ' + str(round(duration, 2)) + ' s')
+    if routing_client is not None:
+        try:
+            routing_client.record_leg(nodes, duration)
+        except (socket.error, ValueError) as e:
+            print('[WARN] Unable to send the leg duration to the routing daemon: ' + str(e))
+    elif learner is not None:
+        learner.record_leg(nodes, duration, room_mapper)
+
+def get_graph():
+    """
+    The graph in this process. When the routing daemon planned the route the map is
+    loaded only here, the first time the route needs repairing.
+    """
+    global graph
+    if graph is None:
+        graph, _, _ = load_map(map_path)
+        graph.set_coordinates(room_mapper)
+        if os.path.exists(weights_path):
+            EdgeWeightLearner.static_load(weights_path, graph.directed).apply(graph)
+    return graph
+
 def load_language(languages_path, language_code):
     """
     Load the translation file based on the selected language.
@@ -389,10 +628,21 @@ def main():
                         help='ID of the room to go to')
     parser.add_argument("--alevel", type=int, default=1,
                         help='Disability level. The higher it is, the more paths are available')
+    parser.add_argument("--capabilities", type=str, default='',
+                        help='Comma-separated barriers the user can pass (' + ', '.join(sorted(FEATURES)) +
+                             '). Routes are planned for them instead of --alevel')
     parser.add_argument("--wtime", type=int, default=60,
                         help='Number of seconds to wait with the hand raised before canceling the procedure')
     parser.add_argument("--lang", type=str, default='en',
                         help='Language')
+    parser.add_argument("--map", type=str, default='src/config/map.json',
+                        help='Map bundle (.json) or binary map file')
+    parser.add_argument("--voice_guidance", action='store_true',
+                        help='Announce the turns and the distance left before each motion leg')
+    parser.add_argument("--weights", type=str, default='src/config/learned_weights.txt',
+                        help='File of the edge weights learned from the traversal times')
+    parser.add_argument("--socket", type=str, default=DEFAULT_SOCKET_PATH,
+                        help='Unix socket of the routing daemon. Without a daemon the route is planned in process')
 
     args = parser.parse_args()
     pip = args.pip
@@ -410,8 +660,9 @@ def main():
     session = app.session
 
     # ------------------------- User specific parameters ------------------------- #
-    global alevel, wtime, lang
+    global alevel, route_level, wtime, lang
     alevel = args.alevel
+    route_level = parse_level(args.capabilities) if args.capabilities else args.alevel
     wtime = args.wtime
 
     lang = load_language('src/config/languages', args.lang)
@@ -434,25 +685,92 @@ def main():
     # mws.setDemoPathAuto(__file__) # Better leave this here
 
     # --------------------------- Graph initialization --------------------------- #
-    graph = Graph.static_load('src/config/graph.txt')
-    distance, path = graph.shortest_path(args.current_room, args.target_room, args.alevel)
+    global graph, map_path, routing_client, room_mapper, target_room
+    global path, planner, alternatives, learner, weights_path
+    map_path = args.map
+    weights_path = args.weights
+    learner = None
+    target_room = args.target_room
+    planner = None
+
+    routing_client = RoutingClient(args.socket)
+    if routing_client.available():
+        # The daemon keeps the map and the route caches warm across sessions
+        print("[INFO] Planning with the routing daemon at " + args.socket)
+        graph = None
+        room_mapper = routing_client.room_mapper()
+        distance, path = routing_client.shortest_path(args.current_room, args.target_room, route_level)
+        alternatives = routing_client.k_shortest_paths(args.current_room, args.target_room, route_level, 3)[1:]
+    else:
+        print("[WARN] Routing daemon not running at " + args.socket + ", planning in process")
+        routing_client = None
+        graph, room_mapper, graph_path = load_map(map_path)
+
+        print("[INFO] Rooms coordinates  : ")
+        for name, (x, y) in room_mapper.rooms.items():
+            print("[INFO] \t" + name + ": ( " + str(x) + ", " + str(y) + ")")
+
+        for node1, node2, entries, reverse_entries in graph.asymmetric_edges:
+            print("[WARN] Edge " + str(node1) + " - " + str(node2) + " is listed as (weight, accessibility weight) " +
+                  str(entries) + " in one direction and " + str(reverse_entries) + " in the other")
+
+        _, missing, inconsistent = graph.check_coordinates()
+        for node in missing:
+            print("[WARN] Missing coordinates for " + str(node))
+        for node1, node2, weight, straight_distance in inconsistent:
+            print("[WARN] Edge " + str(node1) + " -> " + str(node2) + " has weight " + str(weight) +
+                  ", shorter than the straight-line distance " + str(round(straight_distance, 2)))
+
+        for level, edge_count in sorted(graph.level_edge_counts().items()):
+            print("[INFO] Edges at accessibility level " + str(level) + ": " + str(edge_count))
+
+        learner = EdgeWeightLearner(directed=graph.directed)
+        if os.path.exists(weights_path):
+            learner.load(weights_path)
+
+        # The precomputed route table and landmarks, rebuilt only when the map file changes,
+        # describe the original weights
+        if learner.apply(graph):
+            print("[INFO] Using learned edge weights, without the precomputed route table")
+        else:
+            if len(graph.adjacency_list) <= RouteTable.MAX_NODES:
+                graph.attach_route_table(RouteTable.load_or_build(graph, graph_path))
+            graph.attach_landmarks(Landmarks.load_or_build(graph, graph_path))
+
+        distance, path = graph.shortest_path(args.current_room, args.target_room, route_level)
+        planner = new_planner(graph, args.current_room)
+        alternatives = graph.k_shortest_paths(args.current_room, args.target_room, route_level, 3)[1:]
     print("[INFO] Current room       : " + str(args.current_room))
     print("[INFO] Target room        : " + str(args.target_room))
-    print("[INFO] Accessibility level: " + str(args.alevel))
+    print("[INFO] Accessibility level: " + str(route_level))
     print("[INFO] Path               : " + str(path))
+    if not path:
+        # The reachability index answers without searching the map
+        if routing_client is not None:
+            minimum_level = routing_client.minimum_level(args.current_room, args.target_room)
+        else:
+            minimum_level = graph.minimum_level(args.current_room, args.target_room)
+        if minimum_level is None:
+            print("[ERROR] " + str(args.target_room) + " cannot be reached from " + str(args.current_room) +
+                  " at any accessibility level")
+        else:
+            print("[ERROR] No route at accessibility level " + str(route_level) + ", " + str(args.target_room) +
+                  " can be reached from accessibility level " + str(minimum_level))
+        sys.exit(1)
 
-    # Take the coordinates for each node
-    global coords
-    room_mapper = RoomMapper.static_load('src/config/coords.txt')
-    print("[INFO] Rooms coordinates  : ")
-    for name, (x, y) in room_mapper.rooms.items():
-        print("[INFO] \t" + name + ": ( " + str(x) + ", " + str(y) + ")")
-    coords = [room_mapper[node] for node in path]
+    # Compile the motion legs and the guidance once for the whole route
+    global guidance_cache, voice_guidance
+    guidance_cache = GuidanceCache()
+    voice_guidance = args.voice_guidance
+    # The robot starts in the current room
+    global current_x, current_y
+    current_x, current_y = room_mapper[path[0]]
+    set_route(path, from_node=True)
+    print("[INFO] Motion legs        : " + str(len(legs)) + " for " + str(len(path)) + " nodes")
 
     # Use the first node to establish which hand to raise
     global hand_picked
-    first_coords = coords[0]
-    first_x, _ = first_coords
+    first_x, _ = room_mapper[path[0]]
     hand_picked = 'Right' if first_x < 0 else 'Left'
     print("[INFO] Selected " + hand_picked.lower() + " hand to raise")
 
@@ -0,0 +1,65 @@
+import argparse
+import csv
+import sys
+
+from graph.routing_service import load_map
+
+# Offline route planning: reads a CSV of queries and writes the routes, without connecting to Naoqi.
+#
+# Input rows:  start,end,accessibility_level
+# Output rows: start,end,accessibility_level,distance,path (space separated nodes)
+
+
+def read_queries(path):
+    queries = []
+    with open(path, 'r') as file:
+        for row in csv.reader(file):
+            if not row or row[0].strip().startswith('#'):
+                continue
+            try:
+                start, end, accessibility_level = [value.strip() for value in row[:3]]
+                queries.append((start, end, int(accessibility_level)))
+            except ValueError:
+                # Header or malformed row
+                if queries:
+                    print("[WARN] Skipping malformed row: " + ",".join(row))
+    return queries
+
+
+def write_routes(file, queries, routes):
+    writer = csv.writer(file)
+    writer.writerow(['start', 'end', 'accessibility_level', 'distance', 'path'])
+    for (start, end, accessibility_level), (distance, route) in zip(queries, routes):
+        writer.writerow([start, end, accessibility_level, distance, " ".join(str(node) for node in route)])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--map", type=str, default='src/config/map.json',
+                        help='Map bundle (.json) or binary map file')
+    parser.add_argument("--graph", type=str, default=None,
+                        help='Graph file in the text format, loaded instead of the map')
+    parser.add_argument("--queries", type=str, required=True,
+                        help='CSV file with one start,end,accessibility_level query per row')
+    parser.add_argument("--output", type=str, default=None,
+                        help='CSV file to write the routes to. Defaults to the standard output')
+    parser.add_argument("--method", type=str, default='auto', choices=['auto', 'dijkstra', 'floyd_warshall'],
+                        help='Batch planning method')
+    args = parser.parse_args()
+
+    graph, _, _ = load_map(args.map, args.graph)
+    queries = read_queries(args.queries)
+    routes = graph.shortest_paths_batch(queries, method=args.method)
+
+    unreachable = sum(1 for distance, _ in routes if distance == float('inf'))
+    sys.stderr.write("[INFO] Planned " + str(len(queries)) + " routes, " + str(unreachable) + " unreachable\n")
+
+    if args.output is None:
+        write_routes(sys.stdout, queries, routes)
+    else:
+        with open(args.output, 'w') as file:
+            write_routes(file, queries, routes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import argparse
+import os
+import sys
+
+from graph.edge_learning import EdgeWeightLearner
+from graph.landmarks import Landmarks
+from graph.route_table import RouteTable
+from graph.routing_engine import RoutingEngine
+from graph.routing_service import DEFAULT_SOCKET_PATH, RoutingServer, load_map
+
+# Long-lived routing daemon: loads the map and the route table once and answers the guidance
+# sessions (main.py) over a Unix socket until interrupted.
+#
+# Example:
+#   python2 src/routing_daemon.py --socket /tmp/pepper_routing.sock
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--map", type=str, default='src/config/map.json',
+                        help='Map bundle (.json) or binary map file')
+    parser.add_argument("--graph", type=str, default=None,
+                        help='Graph file in the text format, loaded instead of the map')
+    parser.add_argument("--coords", type=str, default=None,
+                        help='Room coordinates file in the text format, loaded with --graph')
+    parser.add_argument("--socket", type=str, default=DEFAULT_SOCKET_PATH,
+                        help='Unix socket to listen on')
+    parser.add_argument("--weights", type=str, default='src/config/learned_weights.txt',
+                        help='File of the edge weights learned from the traversal times')
+    args = parser.parse_args()
+
+    graph, room_mapper, graph_path = load_map(args.map, args.graph, args.coords)
+
+    learner = EdgeWeightLearner(directed=graph.directed)
+    if os.path.exists(args.weights):
+        learner.load(args.weights)
+
+    # The precomputed route table and landmarks, rebuilt only when the map file changes,
+    # describe the original weights
+    if learner.apply(graph):
+        sys.stderr.write("[INFO] Using learned edge weights, without the precomputed route table\n")
+    else:
+        if len(graph.adjacency_list) <= RouteTable.MAX_NODES:
+            graph.attach_route_table(RouteTable.load_or_build(graph, graph_path))
+        graph.attach_landmarks(Landmarks.load_or_build(graph, graph_path))
+    engine = RoutingEngine(graph)
+
+    server = RoutingServer(engine, room_mapper, args.socket, learner, args.weights)
+    sys.stderr.write("[INFO] Routing daemon listening on " + args.socket + "\n")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()